@@ -0,0 +1,176 @@
+"""
+Throughput benchmarks for the GA engine and the representations.
+
+Runs GA_SEARCH on f1-f5 with every encoding of main.py (sweep), a sweep job of GA_SEARCH_BATCH for the same pairs,
+and micro-benchmarks of representation construction, the chromosome operators, wheel selection and
+data_analysis.analyze. Every benchmark reports the time of one call, from rounds that each repeat the call for at
+least 0.2 seconds. Results are written as JSON and can be compared against a stored baseline: every benchmark
+whose time per call grew by more than the threshold is reported as a regression, and the script exits with status 1.
+
+Everything runs offline and writes only to a temporary directory, e.g.
+
+    python benchmark.py --save-baseline            # record benchmark_baseline.json on this machine
+    python benchmark.py --compare                  # later: fail if anything got more than 25% slower
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+import numpy
+import main as sweep
+import population
+import representation as rp
+import testFunctions as tf
+from chromosome import Chromosome, wheel_selection
+from data_analysis import analyze
+from optimizationGA import GA_SEARCH, GA_SEARCH_BATCH
+from seeding import trial_streams
+
+BASELINE = "benchmark_baseline.json"
+THRESHOLD = 0.25   # relative slowdown that counts as a regression
+EVAL_LIMIT = 5000  # fitness evaluations per GA_SEARCH trial
+
+
+def timed(func, repeat = 3):
+    """
+    returns the best time in seconds of one call of func over repeat rounds. Every round makes as many calls as it
+    takes to run for at least 0.2 seconds (see timeit.Timer.autorange), so short calls are not lost in timer noise
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number))/number
+
+
+def bench_ga(trials, directory):
+    """
+    GA_SEARCH trials of every (function, encoding) pair of main.py. Representation tables are built before timing,
+    so the times are those of the GA itself
+    """
+    results = {}
+    rng = numpy.random.default_rng(0)
+    rp.warmRepresentationCache([(code, r) for r in sweep.ranges for code in sweep.codes.values()])
+    for j, (fn, interval) in enumerate(zip(sweep.funcs, sweep.ranges), 1):
+        for name, code in sweep.codes.items():
+            file = os.path.join(directory, "f" + str(j) + "_" + name)
+            seconds = timed(lambda: GA_SEARCH(sweep.m, sweep.c, sweep.p, sweep.g, code, file, fn, interval, sweep.key, rng=rng),
+                            repeat = trials)
+            results["ga/f" + str(j) + "/" + name] = {"seconds": seconds, "evals_per_second": EVAL_LIMIT/seconds}
+    return results
+
+
+def bench_batch(trials, directory):
+    """
+    one sweep job of GA_SEARCH_BATCH (sweep.TRIALS_PER_JOB trials with their own streams, as main.run_trials) for every
+    (function, encoding) pair of main.py. This is the engine the sweep runs
+    """
+    results = {}
+    n = sweep.TRIALS_PER_JOB
+    rp.warmRepresentationCache([(code, r) for r in sweep.ranges for code in sweep.codes.values()])
+    for j, (fn, interval) in enumerate(zip(sweep.funcs, sweep.ranges), 1):
+        for name, code in sweep.codes.items():
+            file = os.path.join(directory, "f" + str(j) + "_" + name + "_T")
+            seconds = timed(lambda: GA_SEARCH_BATCH(sweep.m, sweep.c, sweep.p, sweep.g, code, file, fn, interval, sweep.key,
+                                                    trials=n, rng=trial_streams(0, j, name, 1, n)), repeat = trials)
+            results["batch/f" + str(j) + "/" + name] = {"seconds": seconds, "evals_per_second": n*EVAL_LIMIT/seconds}
+    return results
+
+
+def bench_micro(repeat, directory):
+    """
+    micro-benchmarks, each timed as the best of repeat rounds
+    """
+    results = {}
+    interval17 = sweep.ranges[4]   # the 17 bit interval of f5
+    results["rep/gray_17"] = timed(lambda: rp.generateGrayRepresentation(interval17).get_table(), repeat)
+    results["rep/ngg_17"] = timed(lambda: rp.generateNGG(interval17).get_table(), repeat)
+
+    rng = numpy.random.default_rng(0)
+    REP = rp.cachedRepresentation(sweep.GRAY_CODE, sweep.ranges[3])
+    dim = tf.f4.get_input_dimension()
+    pop = [Chromosome(REP, REP.get_random_bitstr(rng, dim)) for _ in range(sweep.p)]
+    results["chromosome/mutate"] = timed(lambda: [chrom.mutate(sweep.m, rng) for chrom in pop], repeat)
+    results["chromosome/crossover"] = timed(lambda: [pop[i].crossover(pop[i+1], rng) for i in range(0, len(pop) - 1, 2)], repeat)
+
+    fmap = {chrom: chrom.eval_fitness(tf.f4, rng) for chrom in pop}
+    f_prime = max(fmap.values())
+    results["selection/wheel_selection"] = timed(lambda: [wheel_selection(pop, fmap, f_prime, min) for _ in range(sweep.p//2)], repeat)
+    fitness = numpy.array(list(fmap.values()))
+    results["selection/population_wheel"] = timed(lambda: population.wheel_selection(fitness, f_prime, min, sweep.p, rng), repeat)
+
+    fnames = []
+    for i in range(20):
+        fnames.append(os.path.join(directory, "analyze" + str(i) + ".txt"))
+        with open(fnames[-1], "w") as f:
+            f.write("\n".join(str(v) for v in rng.normal(0, 1, EVAL_LIMIT).tolist()) + "\n")
+    results["data_analysis/analyze"] = timed(lambda: analyze(fnames), repeat)
+    return {name: {"seconds": seconds} for name, seconds in results.items()}
+
+
+def run_suite(trials = 3, repeat = 5, suites = ("ga", "batch", "micro")):
+    """
+    runs the benchmark suites and returns the report: machine details under "meta" and one entry per benchmark under
+    "results", each with the seconds per call (lower is better) and, for GA runs, the evaluations per second
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        if "micro" in suites:
+            results.update(bench_micro(repeat, directory))
+        if "ga" in suites:
+            results.update(bench_ga(trials, directory))
+        if "batch" in suites:
+            results.update(bench_batch(trials, directory))
+    meta = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "numpy": numpy.__version__,
+            "machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count()}
+    return {"meta": meta, "results": results}
+
+
+def compare(report, baseline, threshold = THRESHOLD):
+    """
+    returns the list of (benchmark, baseline seconds, current seconds) of every benchmark in both reports that is more
+    than threshold (relative) slower than the baseline
+    """
+    regressions = []
+    for name, entry in report["results"].items():
+        if name in baseline["results"]:
+            base = baseline["results"][name]["seconds"]
+            if entry["seconds"] > base*(1 + threshold):
+                regressions.append((name, base, entry["seconds"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Throughput benchmarks of the GA engine and representations")
+    parser.add_argument("--out", default = None, help = "write the JSON report to this file")
+    parser.add_argument("--baseline", default = BASELINE, help = "baseline report (default: " + BASELINE + ")")
+    parser.add_argument("--save-baseline", action = "store_true", help = "store this run as the baseline")
+    parser.add_argument("--compare", action = "store_true", help = "compare against the baseline, exit 1 on regressions")
+    parser.add_argument("--threshold", type = float, default = THRESHOLD, help = "relative slowdown counted as a regression")
+    parser.add_argument("--trials", type = int, default = 3, help = "timing rounds per (function, encoding) pair")
+    parser.add_argument("--repeat", type = int, default = 5, help = "rounds per micro-benchmark")
+    parser.add_argument("--suite", choices = ["ga", "batch", "micro"], action = "append", help = "run only these suites")
+    args = parser.parse_args()
+
+    report = run_suite(args.trials, args.repeat, args.suite or ("ga", "batch", "micro"))
+    for name, entry in report["results"].items():
+        print(name.ljust(36) + ("%.6f s" % entry["seconds"]).rjust(14)
+              + ("   %.0f evals/s" % entry["evals_per_second"] if "evals_per_second" in entry else ""))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent = 1)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent = 1)
+    if args.compare:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for name, base, now in regressions:
+            print("REGRESSION " + name + ": " + "%.6f s -> %.6f s (%+.0f%%)" % (base, now, 100*(now/base - 1)))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Checkpointing for long GA sweeps.
+
+SweepCheckpoint is an append-only log of the (function, encoding, trial) tuples of a sweep that
+have completed, together with the RNG seed each one ran with. A resumed sweep skips the completed
+trials and reruns everything else, including trials whose files were only partially written.
+
+save_snapshot and load_snapshot store the state of a single GA run every few generations, so a
+very long run can restart mid-trial (see GA_SEARCH_ARRAY).
+"""
+import json
+import os
+
+
+class SweepCheckpoint:
+    """
+    fname -- path of the checkpoint log. One JSON object per completed trial, e.g.
+             {"function": 1, "encoding": "BRG", "trial": 7, "seed": 12345}
+    resume -- if False, an existing log is discarded and the sweep starts over
+    """
+    def __init__(self, fname, resume = True):
+        self._fname = fname
+        self._done = {}
+        if resume and os.path.exists(fname):
+            with open(fname, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break   # torn last line of an interrupted write
+                    self._done[(entry["function"], entry["encoding"], entry["trial"])] = entry["seed"]
+        # rewrite the log with just the valid entries, so new ones are never appended to a torn line. The entries go
+        # to a new file that replaces the log only once it is on disk, so the log is never lost in between
+        tmp = fname + ".tmp"
+        with open(tmp, 'w') as self._f:
+            self._write(self._done.items())
+        os.replace(tmp, fname)
+        self._f = open(fname, 'a')
+
+    def is_done(self, function, encoding, trial):
+        return (function, encoding, trial) in self._done
+
+    def seed(self, function, encoding, trial):
+        """
+        returns the seed a completed trial ran with
+        """
+        return self._done[(function, encoding, trial)]
+
+    def num_done(self):
+        return len(self._done)
+
+    def record(self, function, encoding, trials, seeds):
+        """
+        marks trials of (function, encoding) as completed, seeds[i] being the seed trial trials[i] ran with.
+        The log is flushed to disk before returning.
+        """
+        entries = [((function, encoding, trial), seed) for trial, seed in zip(trials, seeds)]
+        self._done.update(entries)
+        self._write(entries)
+
+    def _write(self, entries):
+        for (function, encoding, trial), seed in entries:
+            self._f.write(json.dumps({"function": function, "encoding": encoding, "trial": trial, "seed": seed}) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def save_snapshot(path, **state):
+    """
+    atomically writes the arrays and numbers in state to the .npz file path
+    """
+    import numpy
+    tmp = path + ".tmp.npz"
+    numpy.savez(tmp, **state)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path):
+    """
+    returns the state saved by save_snapshot as a dictionary of numpy arrays
+    """
+    import numpy
+    with numpy.load(path) as data:
+        return {k: data[k] for k in data.files}
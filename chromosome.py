@@ -45,12 +45,33 @@ class Chromosome:
         """
         return [self._rep.to_num(self._vec[i:i+self._b]) for i in range(0, len(self._vec), self._b)]
 
-    def eval_fitness(self, fn):
+    def eval_fitness(self, fn, rng=None):
         """
         computes the fitness of self based on the function fn being optimized. fn is a TestFn object. 
         Note that self.to_real_vec() is the genotype to phenotype mapping, and fn is the phenotype to R mapping.
-        """
-        return fn.eval(self.to_real_vec())
+        rng -- numpy Generator for the noise of fn, if any
+        """
+        return fn.eval(self.to_real_vec(), rng)
+
+    def eval_fitness_delta(self, fn, sources, rng=None):
+        """
+        computes the fitness of self for a separable TestFn fn (see TestFn.is_separable) from the terms of the
+        individuals it was derived from. Genes that equal the same gene of a source take the source's term, only the
+        terms of the other genes are computed. Noise, if fn has any, is drawn anew. Returns (fitness, terms)
+        sources -- list of (chromosome, terms) pairs, e.g. the parents of self and their terms
+        rng -- numpy Generator for the noise of fn, if any
+        """
+        b = self._b
+        terms = []
+        for i in range(0, len(self._vec)//b):
+            gene = self._vec[i*b:(i+1)*b]
+            for source, source_terms in sources:
+                if source._vec[i*b:(i+1)*b] == gene:
+                    terms.append(source_terms[i])
+                    break
+            else:
+                terms.append(fn.eval_term(i, self._rep.to_num(gene)))
+        return fn.from_terms(terms, rng), terms
 
     def is_valid(self, string=None):
         """
@@ -67,14 +88,15 @@ class Chromosome:
                 return False
         return True
 
-    def crossover(self, partner):
+    def crossover(self, partner, rng=None):
         """
         Returns two child chromosomes created from self and a partner chromosome.
         The technique used here is one point crossover.
+        rng -- numpy Generator to draw from. Uses the random module if None
         """
         p1, p2 = str(self), str(partner)
         assert(len(p1) == len(p2))
-        point = random.randint(0,len(p1))
+        point = random.randint(0,len(p1)) if rng is None else int(rng.integers(0, len(p1) + 1))
         child1 = p1[:point] + p2[point:]
         child2 = p2[:point] + p1[point:]
         assert(len(child1) == len(p1))
@@ -82,13 +104,19 @@ class Chromosome:
         return [Chromosome(self._rep, child1), Chromosome(self._rep, child2)]
 
 
-    def mutate(self, pm):
+    def mutate(self, pm, rng=None):
         """
         multi-bit mutation. Called after mutation rate check is made.
         returns new mutated chromosome. pm = mutation rate
+        rng -- numpy Generator to draw from. Uses the random module if None
         """
-        flip = lambda b : "0" if b == "1" else "1"
         l = len(self._vec)
+        if rng is not None:
+            # one draw for the whole mask, "0" ^ 1 == "1" and "1" ^ 1 == "0"
+            flips = (rng.random(l) <= pm).astype(numpy.uint8)
+            bits = numpy.frombuffer(self._vec.encode(), dtype = numpy.uint8)
+            return Chromosome(self._rep, (bits ^ flips).tobytes().decode())
+        flip = lambda b : "0" if b == "1" else "1"
         mutindiv = []
         for i in range(l):
             if random.uniform(0,1) <= pm:
@@ -150,13 +178,8 @@ def tournament_selection(pop, k, fmap, key):
     """
     assert (0 < k and k <= len(pop)), "invalid tournament size"
 
-    ksubset = []
-    popcopy = pop[:]
-    for i in range(k):
-        ind = random.randint(0,len(popcopy)-1) 
-        chrom = popcopy[ind]
-        ksubset.append(chrom)
-        popcopy.pop(ind) 
+    # k distinct individuals, without copying the population (see selection.tournament_selection for whole mating pools)
+    ksubset = random.sample(pop, k)
 
     assert len(ksubset) == k, "tournament size not met"
 
@@ -4,6 +4,14 @@ Computes statistics from a text file
 import numpy
 import os
 import math
+import pickle
+import argparse
+import multiprocessing
+from results import read_results, BinaryResultSink
+from sweep_store import SweepStore, run_shape
+
+CACHE_VERSION = 2   # version of the analysis cache format, caches of other versions are discarded
+POPSIZE = 30        # population size of the analyzed runs, which determines the length of complete trial files
 
 def analyze(fnames):
     """
@@ -13,8 +21,7 @@ def analyze(fnames):
     """
     lines = []
     for fname in fnames:
-        with open(fname, 'r') as f:
-            lines += [float(line.rstrip()) for line in f]
+        lines += read_results(fname).tolist()
 
     return [round(numpy.mean(lines), 4), round(numpy.std(lines), 4)]
 
@@ -31,9 +38,7 @@ def best_sol_perf(fnames, key, out_fname):
         best = -math.inf
 
     for fname in fnames:
-        lines = []
-        with open(fname, 'r') as f:
-            sols.append([float(line.rstrip()) for line in f])
+        sols.append(read_results(fname))
 
     sols = numpy.array(sols)
     sols = numpy.average(sols, axis = 0)
@@ -44,25 +49,262 @@ def best_sol_perf(fnames, key, out_fname):
     # ...       ...
     # i         sols[i]
 
-    f = open(out_fname, 'w')
-    f.write("# Eval no." + "\t" + "mean best sol" + "\n")
-    for i in range(len(sols)):
-        f.write(str(i) + "\t" + str(sols[i]) + "\n")
+    write_best_sol_dat(sols, out_fname)
+
+
+def write_best_sol_dat(sols, out_fname):
+    """
+    writes the mean best solution curve sols to the .dat file out_fname
+    """
+    with open(out_fname, 'w') as f:
+        f.write("# Eval no." + "\t" + "mean best sol" + "\n")
+        for i in range(len(sols)):
+            f.write(str(i) + "\t" + str(sols[i]) + "\n")
 
     print("Output best sol plot data to " + out_fname)
 
 
+class RunningStats:
+    """
+    Online mean and variance (Welford's algorithm), elementwise over arrays of a fixed shape.
+    Whole chunks of observations are merged at once with the pairwise update of Chan et al.,
+    so the statistics of any number of values are computed in bounded memory.
+
+    shape -- shape of one observation, () for scalars
+    """
+    def __init__(self, shape = ()):
+        self.count = 0
+        self.mean = numpy.zeros(shape)
+        self._m2 = numpy.zeros(shape)
+
+    def update(self, chunk):
+        """
+        adds the observations chunk[0], chunk[1], ... (a chunk of scalars can be any flat array)
+        """
+        n = len(chunk)
+        if n == 0:
+            return
+        mean = numpy.mean(chunk, axis = 0)
+        self.merge(n, mean, numpy.sum((chunk - mean)**2, axis = 0))
+
+    def merge(self, n, mean, m2):
+        """
+        adds n observations given by their mean and sum of squared deviations from the mean m2
+        """
+        if n == 0:
+            return
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta*n/total
+        self._m2 = self._m2 + m2 + delta**2*self.count*n/total
+        self.count = total
+
+    def std(self):
+        """
+        population standard deviation, as numpy.std
+        """
+        return numpy.sqrt(self._m2/self.count)
+
+
+def analyze_store(store, chunk = 256):
+    """
+    same statistics as analyze (Table 3) over all completed trials of a SweepStore, computed in one
+    sequential read of the store with bounded memory. Returns None if no trial has been completed yet
+    """
+    if store.completed().size == 0:
+        return None
+    stats = RunningStats()
+    for rows in store.iter_chunks("online", chunk):
+        stats.update(rows.ravel())
+    return [round(float(stats.mean), 4), round(float(stats.std()), 4)]
+
+
+def best_sol_curve_store(store, chunk = 256):
+    """
+    mean best solution curve over all completed trials of a SweepStore, in bounded memory.
+    Returns None if no trial has been completed yet
+    """
+    stats = None
+    for rows in store.iter_chunks("best_sol", chunk):
+        if stats is None:
+            stats = RunningStats(rows.shape[1:])
+        stats.update(rows)
+    return None if stats is None else stats.mean
+
+
+def best_sol_perf_store(store, out_fname, chunk = 256):
+    """
+    same as best_sol_perf over all completed trials of a SweepStore, in bounded memory.
+    Nothing is written if no trial has been completed yet
+    """
+    curve = best_sol_curve_store(store, chunk)
+    if curve is None:
+        print("No completed trials, skipped " + out_fname)
+        return
+    write_best_sol_dat(curve, out_fname)
+
+
+
+
+
+def file_partial(fname_online, fname_best_sol, shape):
+    """
+    partial aggregates of one trial: count, mean and sum of squared deviations from the mean of its online values,
+    which RunningStats.merge combines without loss of precision, and its best solution curve.
+    Returns None if the files do not hold shape = (online values, best solution values) values, e.g. because
+    the trial is still being written or was killed while writing
+    """
+    online = read_results(fname_online)
+    best_sol = read_results(fname_best_sol)
+    if (len(online), len(best_sol)) != shape:
+        return None
+    mean = float(online.mean())
+    return {"count": len(online), "mean": mean, "m2": float(((online - mean)**2).sum()),
+            "best_sol": best_sol}
+
+
+def file_signature(fname):
+    """
+    (mtime, size) of a file, used to tell whether a cached partial aggregate is stale
+    """
+    st = os.stat(fname)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def trial_files(f, rep, runs, directory = "caruana_data"):
+    """
+    returns the (online, best solution) file pairs of the trials of function f and encoding rep that exist,
+    in text or binary format
+    """
+    pairs = []
+    for i in range(1, runs+1):
+        base = os.path.join(directory, "f" + str(f) + "_" + rep + "_T" + str(i))
+        for ext in (".txt", BinaryResultSink.EXTENSION):
+            if os.path.exists(base + ext) and os.path.exists(base + "best_sol" + ext):
+                pairs.append((base + ext, base + "best_sol" + ext))
+                break
+    return pairs
+
+
+def analyze_group(pairs, cached, shape):
+    """
+    Table 3 statistics and mean best solution curve of one (function, encoding) group of trial files.
+    Only files whose signature differs from the one in cached (fname -> (signature, partial)) are read.
+    Incomplete trials (see file_partial) are skipped and not cached.
+    Returns (stats, curve, entries) where entries are the cache entries of the group's files, or None if no trial
+    is complete.
+    """
+    entries = {}
+    stats = RunningStats()
+    curve = None
+    for fname1, fname2 in pairs:
+        sig = (file_signature(fname1), file_signature(fname2))
+        if fname1 in cached and cached[fname1][0] == sig:
+            partial = cached[fname1][1]
+        else:
+            partial = file_partial(fname1, fname2, shape)
+            if partial is None:
+                continue
+        entries[fname1] = (sig, partial)
+        stats.merge(partial["count"], partial["mean"], partial["m2"])
+        curve = partial["best_sol"].copy() if curve is None else curve + partial["best_sol"]
+
+    if curve is None:
+        return None
+    return [round(float(stats.mean), 4), round(float(stats.std()), 4)], curve/len(entries), entries
+
+
+def analyze_store_group(path):
+    """
+    Table 3 statistics and mean best solution curve of a (function, encoding) group kept in a SweepStore
+    """
+    store = SweepStore(path)
+    return analyze_store(store), best_sol_curve_store(store), {}
+
+
+def _analyze_job(job):
+    kind, arg, cached, shape = job
+    if kind == "store":
+        return analyze_store_group(arg)
+    return analyze_group(arg, cached, shape)
+
+
+def analyze_all(reps, funcs, runs, processes = None, cache_fname = None, directory = "caruana_data", popsize = POPSIZE):
+    """
+    Computes the Table 3 statistics and writes the mean best solution .dat file of every (encoding, function) group.
+    Groups are analyzed in parallel on processes worker processes (all cores if None).
+
+    If cache_fname is given, partial aggregates of every trial file are cached there keyed by path and mtime, so
+    a rerun only reads new or changed files, and groups whose inputs did not change at all are not recomputed.
+    Trial files are complete if they hold as many values as a run with population size popsize writes, groups
+    without any complete trial are skipped. Returns a dictionary (rep, f) -> [mean, std].
+    """
+    cache = {"version": CACHE_VERSION, "files": {}, "groups": {}}
+    if cache_fname is not None and os.path.exists(cache_fname):
+        with open(cache_fname, 'rb') as fh:
+            cached = pickle.load(fh)
+        # caches of older versions hold partials in another format
+        if cached.get("version") == CACHE_VERSION:
+            cache = cached
+
+    results, jobs, keys = {}, [], []
+    for rep in reps:
+        for f in funcs:
+            path = os.path.join(directory, "f" + str(f) + "_" + rep)
+            if SweepStore.exists(path):
+                if SweepStore(path).completed().size == 0:
+                    continue
+                job = ("store", path, None, None)
+                sig = tuple(file_signature(path + ext) for ext in (".online.npy", ".best_sol.npy", ".done.npy"))
+            else:
+                pairs = trial_files(f, rep, runs, directory)
+                if not pairs:
+                    continue
+                job = ("files", pairs, {p[0]: cache["files"][p[0]] for p in pairs if p[0] in cache["files"]},
+                       run_shape(popsize))
+                sig = tuple(file_signature(fname) for pair in pairs for fname in pair)
+
+            cached_group = cache["groups"].get((rep, f))
+            if cached_group is not None and cached_group[0] == sig:
+                results[(rep, f)] = cached_group[1]
+            else:
+                jobs.append(job)
+                keys.append(((rep, f), sig))
+
+    if jobs:
+        with multiprocessing.Pool(processes) as pool:
+            for (k, sig), result in zip(keys, pool.map(_analyze_job, jobs)):
+                if result is None:
+                    continue
+                stats, curve, entries = result
+                results[k] = (stats, curve)
+                cache["groups"][k] = (sig, (stats, curve))
+                cache["files"].update(entries)
+
+    if cache_fname is not None:
+        with open(cache_fname, 'wb') as fh:
+            pickle.dump(cache, fh)
+
+    for (rep, f), (stats, curve) in sorted(results.items()):
+        print(rep, ' f' + str(f))
+        print(stats)
+        write_best_sol_dat(curve, rep + "_f" + str(f) + ".dat")
+    return {k: v[0] for k, v in results.items()}
 
 
 
 NUM_RUNS = 3000
 reps = ["BIN", "BRG", "UBL", "NGG"]
-for rep in reps:
-    for f in range(1,6):
-        fnames1 = [os.path.join("caruana_data", "f" + str(f) + "_" + rep + "_T" + str(i) + ".txt") for i in range(1,NUM_RUNS+1)]
-        fnames2 = [os.path.join("caruana_data", "f" + str(f) + "_" + rep + "_T" + str(i) + "best_sol.txt") for i in range(1,NUM_RUNS+1)]
-        print(rep, ' f' + str(f))
-        print(analyze(fnames1))
-        best_sol_perf(fnames2, min, rep + "_f" + str(f) + ".dat")
 
+def main():
+    parser = argparse.ArgumentParser(description = "Computes Table 3 statistics and best solution curves from caruana_data")
+    parser.add_argument("--processes", type = int, default = None, help = "worker processes (default: all cores)")
+    parser.add_argument("--runs", type = int, default = NUM_RUNS, help = "trials per (function, encoding) pair")
+    parser.add_argument("--popsize", type = int, default = POPSIZE, help = "population size of the analyzed runs")
+    parser.add_argument("--no-cache", action = "store_true", help = "ignore and do not update the analysis cache")
+    args = parser.parse_args()
+    cache_fname = None if args.no_cache else os.path.join("caruana_data", "analysis_cache.pkl")
+    analyze_all(reps, range(1,6), args.runs, args.processes, cache_fname, popsize = args.popsize)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+On-demand construction of NGG- and UBL-style encodings for any number of bits.
+
+The precomputed NGG and UBL encodings only exist for b = 8, 10, 12 and 17, and how they were constructed is
+not recorded. They are characterized by:
+
+NGG -- a Gray code other than the binary reflected one. All precomputed NGG encodings are the binary reflected
+       Gray code on the high b - 3 bits, with the reflected Gray code on the low 3 bits replaced by the cyclic
+       Gray code 0, 1, 3, 7, 5, 4, 6, 2 (traversed backwards in every other block of 8 numbers, like the
+       reflected one). Every one-max target still induces a single maximum, but the low bits flip more evenly,
+       which moves 2^(b-3) Hamming edges from distance 3 to distance 5 and raises the locality by 1/(2b).
+UBL -- the two parity classes of code words map to the two halves of the interval, so every Hamming edge
+       joins a low and a high number and the locality reaches its upper bound 2^(b-1).
+
+build_encoding constructs NGG encodings directly with ngg_codes, which reproduces the precomputed ones exactly.
+UBL encodings are constructed by local search over the orders within the parity classes, maximizing the
+smallest distance between the numbers of Hamming neighbors with the vectorized landscape metrics (see
+landscape.py). Independent restarts run on multiple cores and the best encoding is kept. cached_encoding builds
+every (style, b) once and keeps it in ENCODING_CACHE_DIR, which generateNGG and generateUBL fall back to for
+widths that were not precomputed.
+"""
+import multiprocessing as mp
+import os
+import numpy
+import landscape
+import representation as rp
+
+ENCODING_CACHE_DIR = "encoding_cache"
+STYLES = ("NGG", "UBL")
+
+
+def ngg_codes(b):
+    """
+    NGG encoding on b bits: the binary reflected Gray code with the cyclic 3-bit Gray code 0, 1, 3, 7, 5, 4, 6, 2
+    on the low 3 bits. For b < 3 every Gray code is equivalent to the reflected one, which is returned
+    """
+    if b < 3:
+        return rp.grayCodes(b)
+    low = numpy.array([0, 1, 3, 7, 5, 4, 6, 2], dtype = numpy.int64)
+    i = numpy.arange(2**b, dtype = numpy.int64)
+    block = i >> 3
+    return (rp.grayCodes(b - 3)[block] << 3) | numpy.where(block & 1, low[7 - (i & 7)], low[i & 7])
+
+
+def score(codes):
+    """
+    score of a UBL encoding (codes[k] is the code word of the k-th number) as a tuple, larger is better: the
+    locality, which is 2^(b-1) for every parity split, then the smallest distance between the numbers of any
+    two Hamming neighbors
+    """
+    b = len(codes).bit_length() - 1
+    distances = landscape.neighbor_distances(rp.representationFromCodes(codes, (0, 2**b - 1, 1), "UBL"))
+    return (float(distances.mean()), int(distances.min()))
+
+
+def initial_encoding(b, rng):
+    """
+    random UBL encoding: the even parity code words in random order followed by the odd ones
+    """
+    codes = numpy.arange(2**b, dtype = numpy.int64)
+    parity = ((codes[:, None] >> numpy.arange(b)) & 1).sum(axis = 1) % 2
+    return numpy.concatenate((rng.permutation(codes[parity == 0]), rng.permutation(codes[parity == 1])))
+
+
+def propose(codes, rng):
+    """
+    returns a random neighbor of a UBL encoding: two code words of the same parity class are swapped
+    """
+    n = len(codes)
+    k1, k2 = rng.integers(0, n//2, 2) + int(rng.integers(0, 2))*(n//2)
+    moved = codes.copy()
+    moved[k1], moved[k2] = codes[k2], codes[k1]
+    return moved
+
+
+def local_search(b, iterations, seed):
+    """
+    one restart: hill climbing from a random UBL encoding that accepts every move that is not worse.
+    Returns (score, codes)
+    """
+    rng = numpy.random.default_rng(seed)
+    codes = initial_encoding(b, rng)
+    best = score(codes)
+    for _ in range(iterations):
+        moved = propose(codes, rng)
+        s = score(moved)
+        if s >= best:
+            codes, best = moved, s
+    return best, codes
+
+
+def _restart(args):
+    return local_search(*args)
+
+
+def build_encoding(style, b, iterations = 1000, restarts = None, processes = None, seed = None):
+    """
+    constructs an encoding of the given style ("NGG" or "UBL") on b bits and returns it as a uint32 array of code
+    words, codes[k] being the code word of the k-th number of the interval. NGG encodings are built directly by
+    ngg_codes and the other arguments only apply to the UBL search.
+    iterations -- moves tried per restart
+    restarts -- number of independent restarts, one per process if None
+    processes -- number of worker processes (number of cores if None)
+    seed -- master seed of the restarts (OS entropy if None)
+    """
+    if style not in STYLES:
+        raise ValueError("unknown encoding style " + str(style))
+    if style == "NGG":
+        return ngg_codes(b).astype(numpy.uint32)
+    processes = processes or os.cpu_count()
+    restarts = restarts or processes
+    tasks = [(b, iterations, s) for s in numpy.random.SeedSequence(seed).spawn(restarts)]
+    if processes > 1 and restarts > 1:
+        with mp.Pool(min(processes, restarts)) as pool:
+            results = pool.map(_restart, tasks)
+    else:
+        results = [_restart(task) for task in tasks]
+    best = max(range(len(results)), key = lambda r: results[r][0])
+    return results[best][1].astype(numpy.uint32)
+
+
+def cached_encoding(style, b, directory = ENCODING_CACHE_DIR, **kwds):
+    """
+    returns the encoding of the given style on b bits from the cache directory, building and storing it first
+    if it is not there. The file is memory-mapped read only, like the precomputed encodings. kwds go to build_encoding
+    """
+    fname = os.path.join(directory, style + "_" + str(b) + ".npy")
+    if not os.path.exists(fname):
+        codes = build_encoding(style, b, **kwds)
+        os.makedirs(directory, exist_ok = True)
+        # several processes may build the same encoding at once, each writes its own file before the rename
+        tmp = fname + "." + str(os.getpid()) + ".tmp.npy"
+        numpy.save(tmp, codes)
+        os.replace(tmp, fname)
+    return numpy.load(fname, mmap_mode = 'r')
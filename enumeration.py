@@ -0,0 +1,94 @@
+"""
+Streaming enumeration of all encodings on b bits.
+
+An encoding is a permutation codes of the 2^b code words, codes[k] being the code word of the k-th number
+(the same format as representationFromCodes). enumerate_encodings yields them one at a time as small numpy
+arrays, depth first, so memory stays constant however many there are.
+
+With reduce=True only one encoding per class of encodings that are equivalent under the symmetries of the
+hypercube is yielded: complementing any set of bits (XOR with a mask) and permuting the bit positions both
+keep Hamming neighbors neighbors, so equivalent encodings have the same locality and the same induced optima
+for every target function. The representative of a class is its lexicographically smallest member, which
+has codes[0] = 0 (this fixes the complement mask) and is not larger than any of its bit permutations. The
+check is made on every prefix, so whole subtrees of non-representatives are skipped.
+
+The enumeration can be split into shards for parallel workers: shard i of n yields the encodings below every
+n-th subtree at SHARD_DEPTH, and the shards together yield every encoding exactly once.
+"""
+import itertools
+import numpy
+
+SHARD_DEPTH = 3   # length of the prefixes that are dealt out to the shards
+
+
+def bit_permutation_tables(b):
+    """
+    returns a (b! - 1, 2^b) array whose rows map every code word to its image under one non-identity
+    permutation of the bit positions
+    """
+    codes = numpy.arange(2**b)
+    bits = (codes[:, None] >> numpy.arange(b)) & 1
+    tables = [bits[:, list(perm)] @ (1 << numpy.arange(b)) for perm in itertools.permutations(range(b))]
+    return numpy.array(tables[1:], dtype = numpy.int64).reshape(-1, 2**b)
+
+
+def canonical(codes):
+    """
+    returns the representative of the symmetry class of an encoding, the one enumerate_encodings(reduce=True) yields
+    """
+    codes = numpy.asarray(codes, dtype = numpy.int64) ^ int(codes[0])
+    b = len(codes).bit_length() - 1
+    best = codes
+    for table in bit_permutation_tables(b):
+        image = table[codes]
+        if image.tolist() < best.tolist():
+            best = image
+    return best
+
+
+def enumerate_encodings(b, reduce = False, shard = 0, shards = 1):
+    """
+    yields every encoding on b bits (one per symmetry class if reduce is True) as a uint16 numpy array of code words
+    shard, shards -- yield only shard number shard (0, ..., shards - 1) of the enumeration
+    """
+    assert 0 <= shard < shards, "invalid shard"
+    n = 2**b
+    tables = bit_permutation_tables(b).tolist() if reduce else []
+    prefix = [0]*n
+    used = [False]*n
+    subtree = [0]   # number of subtrees at SHARD_DEPTH visited so far
+
+    def extend(k, active):
+        # active: bit permutations that map the prefix codes[:k] onto itself, so they may still give a smaller encoding
+        if k == min(SHARD_DEPTH, n) and shards > 1:
+            subtree[0] += 1
+            if (subtree[0] - 1) % shards != shard:
+                return
+        if k == n:
+            yield numpy.array(prefix, dtype = numpy.uint16)
+            return
+        # the representative of a class under complements starts with code word 0
+        candidates = [0] if reduce and k == 0 else range(n)
+        for x in candidates:
+            if used[x]:
+                continue
+            still = []
+            for t in active:
+                if tables[t][x] < x:
+                    break
+                if tables[t][x] == x:
+                    still.append(t)
+            else:
+                prefix[k] = x
+                used[x] = True
+                yield from extend(k + 1, still)
+                used[x] = False
+
+    yield from extend(0, list(range(len(tables))))
+
+
+def count_encodings(b, reduce = False):
+    """
+    number of encodings enumerate_encodings(b, reduce) yields, counted by enumerating them
+    """
+    return sum(1 for _ in enumerate_encodings(b, reduce))
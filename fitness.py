@@ -0,0 +1,199 @@
+"""
+Fitness evaluation helpers for the GA.
+
+FitnessCache remembers the fitness of genotypes that were already scored, so individuals that
+survive a generation unchanged (e.g. the elite, or children that were neither crossed nor mutated)
+are not evaluated again. Only deterministic test functions may be cached.
+
+The evaluators score a batch of input vectors with a TestFn, either serially or spread over threads,
+processes or an asyncio event loop, which pays off for objectives that are expensive to evaluate.
+"""
+import asyncio
+import collections
+import inspect
+
+
+class FitnessCache:
+    """
+    Size-bounded genotype to fitness cache with least recently used eviction.
+    Counts hits and misses so the number of saved evaluations can be reported.
+
+    A cache is only valid for one test function, representation and interval. The GA binds it
+    to these on first use (see bind), so it can be reused across the trials of one sweep.
+
+    maxsize -- maximum number of genotypes kept
+    """
+    def __init__(self, maxsize):
+        assert maxsize > 0, "cache size not positive"
+        self._maxsize = maxsize
+        self._cache = collections.OrderedDict()
+        self._owner = None
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, owner):
+        """
+        ties the cache to owner, e.g. a (fn, rep, interval) tuple. Raises ValueError if the cache
+        already holds fitness values for a different owner.
+        """
+        if self._owner is None:
+            self._owner = owner
+        elif self._owner != owner:
+            raise ValueError("FitnessCache is already used for another function or representation")
+
+    def evaluate(self, keys, compute):
+        """
+        returns the list of fitness values of the genotypes keys, taking cached values where possible.
+        Genotypes that occur more than once in keys are only computed once.
+        compute -- function that takes a list of positions in keys and returns the fitness values of those genotypes
+        """
+        values = [None]*len(keys)
+        missing = collections.OrderedDict()   # genotype -> positions in keys
+        for i, k in enumerate(keys):
+            if k in self._cache:
+                self._cache.move_to_end(k)
+                values[i] = self._cache[k]
+                self.hits += 1
+            else:
+                missing.setdefault(k, []).append(i)
+
+        if missing:
+            computed = compute([pos[0] for pos in missing.values()])
+            for (k, pos), v in zip(missing.items(), computed):
+                for i in pos:
+                    values[i] = v
+                self._cache[k] = v
+                self.misses += 1
+                self.hits += len(pos) - 1
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last = False)
+        return values
+
+    def stats(self):
+        """
+        returns a dictionary with the hit and miss counts and the current size of the cache
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class Evaluator:
+    """
+    Base class of the fitness evaluation backends. evaluate scores a batch of input vectors with a TestFn and
+    returns the values in the order of the batch. Subclasses only implement map.
+
+    The noiseless part of the function is computed by the backend, the noise (if any) is drawn afterwards from the
+    caller's rng, so a run gives the same values with every backend. For deterministic functions, identical vectors
+    in a batch are evaluated only once. Evaluators that own a pool can be used as context managers.
+    """
+    def evaluate(self, fn, vectors, rng=None):
+        """
+        returns the list of fitness values of the input vectors under TestFn fn
+        rng -- numpy Generator for the noise of fn, if any
+        """
+        vectors = [tuple(vec) for vec in vectors]
+        if fn.is_deterministic():
+            unique = list(dict.fromkeys(vectors))
+            computed = dict(zip(unique, self.map(fn.eval_formula, unique)))
+            return [computed[vec] for vec in vectors]
+        values = self.map(fn.eval_formula, vectors)
+        return [v + float(e) for v, e in zip(values, fn.sample_noise(rng, len(values)))]
+
+    def map(self, func, vectors):
+        """
+        returns [func(vec) for vec in vectors]
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SerialEvaluator(Evaluator):
+    """
+    evaluates in the calling thread, one vector after the other
+    """
+    def map(self, func, vectors):
+        return [func(vec) for vec in vectors]
+
+
+class ThreadPoolEvaluator(Evaluator):
+    """
+    evaluates on a pool of threads. Suited to objectives that release the GIL, e.g. external simulations or numpy code
+    workers -- number of threads (see concurrent.futures.ThreadPoolExecutor if None)
+    """
+    def __init__(self, workers=None):
+        self._workers = workers
+        self._pool = None
+
+    def map(self, func, vectors):
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(self._workers)
+        return list(self._pool.map(func, vectors))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class ProcessPoolEvaluator(Evaluator):
+    """
+    evaluates on a pathos process pool, which (unlike multiprocessing) can send the lambdas of TestFn objects to the
+    workers. Suited to pure Python objectives that take milliseconds or more per evaluation
+    workers -- number of processes (number of cores if None)
+    chunksize -- number of vectors sent to a worker at a time
+    """
+    def __init__(self, workers=None, chunksize=1):
+        self._workers = workers
+        self._chunksize = chunksize
+        self._pool = None
+
+    def map(self, func, vectors):
+        if self._pool is None:
+            from pathos.multiprocessing import ProcessingPool
+            self._pool = ProcessingPool(nodes = self._workers) if self._workers else ProcessingPool()
+        return self._pool.map(func, vectors, chunksize = self._chunksize)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool.clear()
+            self._pool = None
+
+
+class AsyncioEvaluator(Evaluator):
+    """
+    evaluates every batch on an asyncio event loop, with at most concurrency evaluations running at once.
+    Blocking formulas run in the loop's default executor. If a formula returns an awaitable (e.g. an async def formula
+    that queries a remote simulation), it is awaited on the loop instead. Must not be called from a running event loop
+    concurrency -- maximum number of evaluations in progress at once (unbounded if None)
+    """
+    def __init__(self, concurrency=None):
+        self._concurrency = concurrency
+
+    def map(self, func, vectors):
+        return asyncio.run(self._gather(func, vectors))
+
+    async def _gather(self, func, vectors):
+        loop = asyncio.get_running_loop()
+        limit = asyncio.Semaphore(self._concurrency or max(1, len(vectors)))
+
+        async def one(vec):
+            async with limit:
+                value = await loop.run_in_executor(None, func, vec)
+                if inspect.isawaitable(value):
+                    value = await value
+                return value
+
+        return await asyncio.gather(*[one(vec) for vec in vectors])
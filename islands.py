@@ -0,0 +1,219 @@
+"""
+Island model GA.
+
+GA_SEARCH_ISLANDS splits the search into K subpopulations (islands) that evolve in separate
+processes with the same operators as GA_SEARCH_ARRAY. Every migration_interval generations each
+island replaces its worst individuals with the migrants that have arrived in its inbox queue, then
+puts copies of its best individuals in the inboxes of its neighbours in the migration topology.
+Queues are fed by a background thread, so sending never blocks, and an island that finishes does
+not wait for neighbours that have stopped reading. Islands never wait for each other.
+
+The fitness evaluation budget (5000 evaluations, as in GA_SEARCH) is shared by all islands through
+one counter in shared memory, so an island model run is directly comparable to a single GA run.
+"""
+import multiprocessing as mp
+import queue
+import traceback
+import numpy
+import population
+from representation import cachedRepresentation
+from results import open_result_sinks, TextResultSink
+
+
+class IslandFailed(Exception):
+    """
+    raised by GA_SEARCH_ISLANDS when an island raises or dies. island is its number, error the traceback or exit code
+    """
+    def __init__(self, island, error):
+        Exception.__init__(self, "island " + str(island) + " failed:\n" + str(error))
+        self.island = island
+        self.error = error
+
+
+def ring(i, k):
+    """
+    migration topology: island i sends to island i + 1
+    """
+    return [(i + 1) % k]
+
+
+def fully_connected(i, k):
+    """
+    migration topology: island i sends to every other island
+    """
+    return [j for j in range(k) if j != i]
+
+
+def _claim(counter, n, limit):
+    """
+    reserves up to n fitness evaluations of the shared budget. Returns (index of the first reserved
+    evaluation, number reserved)
+    """
+    with counter.get_lock():
+        start = counter.value
+        granted = max(0, min(n, limit - start))
+        counter.value = start + granted
+    return start, granted
+
+
+def _received(inbox):
+    """
+    yields the migrants that have arrived in inbox so far, without waiting for more
+    """
+    while True:
+        try:
+            yield inbox.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _island(i, REP, fn, mutrate, crossrate, popsize, key, crossover, eval_limit, migration_interval,
+            migrants, seed, counter, inbox, outboxes, results):
+    """
+    evolves island i and puts (i, online, best_sol, None) on results (see _evolve), or (i, None, None, traceback)
+    if it raises
+    """
+    try:
+        online, best_sol = _evolve(REP, fn, mutrate, crossrate, popsize, key, crossover, eval_limit, migration_interval,
+                                   migrants, seed, counter, inbox, outboxes)
+    except Exception:
+        results.put((i, None, None, traceback.format_exc()))
+    else:
+        results.put((i, online, best_sol, None))
+
+
+def _evolve(REP, fn, mutrate, crossrate, popsize, key, crossover, eval_limit, migration_interval,
+            migrants, seed, counter, inbox, outboxes):
+    """
+    evolves one island until the shared evaluation budget is used up. Returns
+    ([(index of first evaluation, online values), ...], [best fitness of every generation])
+    """
+    rng = numpy.random.default_rng(seed)
+    for out in outboxes:
+        # unsent migrants of a neighbour that has finished are dropped at exit instead of blocking it
+        out.cancel_join_thread()
+    best_index = numpy.argmin if key == min else numpy.argmax
+    worst_first = (lambda fit: numpy.argsort(-fit)) if key == min else numpy.argsort
+    online, best_sol = [], []
+
+    start, granted = _claim(counter, popsize, eval_limit)
+    if granted == 0:
+        return online, best_sol
+    POP = population.random_population(REP, popsize, fn.get_input_dimension(), rng=rng)
+    FITNESS = population.evaluate_population(POP, REP, fn, rng=rng)
+    online.append((start, FITNESS[:granted].tolist()))
+    best_sol.append(key(FITNESS.tolist()))
+
+    npairs = popsize//2
+    gen = 1
+    while granted > 0:
+        gen += 1
+        start, granted = _claim(counter, 2*npairs, eval_limit)
+        if granted == 0:
+            break
+        # scaling window of 1
+        f_prime = FITNESS.max() if key == min else FITNESS.min()
+        parents = population.wheel_selection(FITNESS, f_prime, key, 2*npairs, rng)
+        child1, child2 = crossover(POP[parents[0::2]], POP[parents[1::2]], crossrate, rng)
+        children = numpy.empty((2*npairs, POP.shape[1]), dtype=numpy.uint8)
+        children[0::2] = child1
+        children[1::2] = child2
+        children = population.mutate(children, mutrate, rng)
+
+        # elitist replacement, as in GA_SEARCH_ARRAY
+        POP = numpy.vstack((children, POP[best_index(FITNESS)]))
+        FITNESS = population.evaluate_population(POP, REP, fn, rng=rng)
+        online.append((start, FITNESS[:granted].tolist()))
+
+        # migration: replace the worst individuals with whatever has arrived, then send copies of the best ones
+        if gen % migration_interval == 0:
+            for bits, fit in _received(inbox):
+                worst = worst_first(FITNESS)[:len(fit)]
+                POP[worst] = bits
+                FITNESS[worst] = fit
+            best = worst_first(FITNESS)[::-1][:migrants]
+            for out in outboxes:
+                out.put((POP[best], FITNESS[best]))
+
+        best_sol.append(key(FITNESS.tolist()))
+
+    return online, best_sol
+
+
+def GA_SEARCH_ISLANDS(mutrate, crossrate, popsize, gens, rep, file, fn, interval, key=min, islands=4, migration_interval=10,
+                      migrants=1, topology=ring, crossover=population.one_point_crossover, sink=TextResultSink, seed=None):
+    """
+    Island model version of GA_SEARCH_ARRAY. The parameters are the same, except:
+
+    popsize -- population size of every island
+    islands -- number of islands, each evolved in its own process
+    migration_interval -- number of generations between migrations
+    migrants -- number of best individuals every island sends to each neighbour per migration
+    topology -- function (i, islands) -> list of islands that island i sends migrants to, e.g. ring or fully_connected
+    seed -- master seed, the islands draw from independent streams spawned from it (OS entropy if None)
+
+    The online file gets the fitness of all 5000 evaluations in the order the islands reserved them from the shared
+    budget. Line i of the best solution file is the best fitness over the islands in their i-th generation.
+    """
+    assert popsize > 0, "popsize is not positive"
+    assert 0 <= mutrate and mutrate <= 1, "invalid mutation rate"
+    assert 0 <= crossrate and crossrate <= 1, "invalid crossover rate"
+    assert gens > 0, "num of generations not positive"
+    assert islands > 0, "num of islands not positive"
+
+    EVAL_LIMIT = 5000
+    # built before forking so the islands share the representation tables
+    REP = cachedRepresentation(rep, interval)
+    ctx = mp.get_context("fork")
+    counter = ctx.Value('q', 0)
+    results = ctx.Queue()
+
+    inboxes = [ctx.Queue() for _ in range(islands)]
+
+    seeds = numpy.random.SeedSequence(seed).spawn(islands)
+    procs = []
+    for i in range(islands):
+        outboxes = [inboxes[j] for j in topology(i, islands)]
+        proc = ctx.Process(target = _island, args = (i, REP, fn, mutrate, crossrate, popsize, key, crossover, EVAL_LIMIT,
+                                                     migration_interval, migrants, seeds[i], counter, inboxes[i], outboxes,
+                                                     results))
+        proc.start()
+        procs.append(proc)
+    # only the islands use the inboxes: dropping the parent's references closes its copies of their pipe ends
+    # (Process.start releases its arguments)
+    del inboxes, outboxes
+
+    # wait for every island's result. If one raises or dies, the others are stopped and the error is raised here
+    collected = {}
+    try:
+        while len(collected) < islands:
+            try:
+                i, chunks, bests, error = results.get(timeout = 0.1)
+            except queue.Empty:
+                for i, proc in enumerate(procs):
+                    # islands that exit normally have put their result first
+                    if i not in collected and proc.exitcode not in (None, 0):
+                        raise IslandFailed(i, "exit code " + str(proc.exitcode))
+                continue
+            if error is not None:
+                raise IslandFailed(i, error)
+            collected[i] = (chunks, bests)
+    finally:
+        for proc in procs:
+            if len(collected) < islands:
+                proc.terminate()
+            proc.join()
+
+    online = numpy.full(EVAL_LIMIT, numpy.nan)
+    best_sol = {}
+    for chunks, bests in collected.values():
+        for start, values in chunks:
+            online[start:start + len(values)] = values
+        for gen, value in enumerate(bests):
+            best_sol.setdefault(gen, []).append(value)
+
+    f, g = open_result_sinks(file, sink)
+    with f, g:
+        f.write_many(online[:counter.value].tolist())
+        g.write_many([key(best_sol[gen]) for gen in sorted(best_sol)])
+
@@ -0,0 +1,123 @@
+"""
+Landscape analysis of representations.
+
+A target function over the 2^b numbers of a representation induces a fitness landscape on the b-bit
+code words, where the neighbors of a code word are the b code words at Hamming distance 1. Here code
+words are integers, the neighbors of code word c are c ^ (1 << i), and the number each code word maps
+to comes from the representation's decode table, so whole landscapes (or a whole matrix of target
+functions at once) are analyzed with numpy instead of bitstring operations.
+
+Target functions are given like the perm lists of representation.py: perm[x] is the fitness of the
+number x, so the representation must map its code words to the integers 0, ..., 2^b - 1.
+"""
+import functools
+import numpy
+
+# largest number of (target, code word) fitness values held in one array, about 32 MB of float64
+CHUNK_ELEMENTS = 1 << 22
+
+
+@functools.lru_cache(maxsize = 4)
+def neighbors(b):
+    """
+    returns the (2^b, b) array of Hamming neighbors of all b-bit code words. Column i flips bit i counted from
+    the left, the same order as Representation.get_neighbors. The array is shared and read only
+    """
+    codes = numpy.arange(2**b, dtype = numpy.int64)
+    nbrs = codes[:, None] ^ (1 << numpy.arange(b - 1, -1, -1, dtype = numpy.int64))
+    nbrs.setflags(write = False)
+    return nbrs
+
+
+def value_index(rep):
+    """
+    returns the array of the integer number that every code word of rep maps to, which indexes target functions
+    """
+    return numpy.rint(rep.get_table()).astype(numpy.int64)
+
+
+def induced_fitness(targets, rep):
+    """
+    returns the fitness of every code word of rep under each target function. targets is a (2^b,) array
+    or a (m, 2^b) matrix of target functions, the result has the same shape with columns indexed by code word
+    """
+    return numpy.asarray(targets)[..., value_index(rep)]
+
+
+def optima_mask(targets, rep, key = max):
+    """
+    returns a boolean array of the same shape as targets that is True for every code word that is an induced
+    optimum (maximum if key is max, minimum if key is min), i.e. no Hamming neighbor is strictly better.
+    The target matrix is processed in chunks of rows, so it can be large.
+    """
+    targets = numpy.asarray(targets)
+    if targets.ndim == 1:
+        return optima_mask(targets[None], rep, key)[0]
+    b = rep.num_bits()
+    nbrs = neighbors(b)
+    mask = numpy.empty(targets.shape, dtype = bool)
+    rows = max(1, CHUNK_ELEMENTS // targets.shape[1])
+    for start in range(0, len(targets), rows):
+        F = induced_fitness(targets[start:start + rows], rep)
+        m = numpy.ones(F.shape, dtype = bool)
+        for i in range(b):
+            if key == max:
+                m &= F[:, nbrs[:, i]] <= F
+            else:
+                m &= F[:, nbrs[:, i]] >= F
+        mask[start:start + rows] = m
+    return mask
+
+
+def count_optima(targets, rep, key = max):
+    """
+    returns the number of induced optima of every target function (a single count for a (2^b,) target)
+    """
+    return optima_mask(targets, rep, key).sum(axis = -1)
+
+
+def one_max_targets(b, avals = None, top = None):
+    """
+    returns the (len(avals), 2^b) matrix of one-max targets perm[x] = top - |x - a|, one row per a in avals
+    (all 2^b values if None). top defaults to a, the target of optimaFitMetric
+    """
+    x = numpy.arange(2**b)
+    avals = x if avals is None else numpy.asarray(avals)
+    top = avals[:, None] if top is None else top
+    return top - numpy.abs(x - avals[:, None])
+
+
+def one_max_optima_counts(rep):
+    """
+    returns the array whose entry a is the number of induced maxima of the one-max target peaked at a, for all
+    a = 0, ..., 2^b - 1. Same as count_optima(one_max_targets(b), rep), but in O(2^b b) time and memory:
+    code word c is a maximum exactly for the a that are at least as close to c's number as to the number of any
+    neighbor, which is an interval of a, so the counts are a cumulative sum of interval ends.
+    """
+    n = 2**rep.num_bits()
+    v = value_index(rep)
+    vn = v[neighbors(rep.num_bits())]
+    s = vn + v[:, None]
+    # a neighbor with a larger number bounds a from above by the midpoint, one with a smaller number from below
+    hi = numpy.where(vn > v[:, None], s // 2, n - 1).min(axis = 1)
+    lo = numpy.where(vn < v[:, None], (s + 1) // 2, 0).max(axis = 1)
+    valid = lo <= hi
+    counts = numpy.bincount(lo[valid], minlength = n + 1) - numpy.bincount(hi[valid] + 1, minlength = n + 1)
+    return numpy.cumsum(counts)[:n]
+
+
+def neighbor_distances(rep):
+    """
+    returns the (2^b, b) array of |x - y| for every code word and each of its Hamming neighbors, where x and y
+    are the numbers they map to
+    """
+    v = value_index(rep)
+    return numpy.abs(v[neighbors(rep.num_bits())] - v[:, None])
+
+
+def locality(rep):
+    """
+    mean distance between the numbers of Hamming neighbors. Binary and Gray codes reach the lower bound
+    (2^b - 1)/b, encodings that map the two parity classes to the two halves of the interval the upper bound 2^(b-1)
+    """
+    return float(neighbor_distances(rep).mean())
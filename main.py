@@ -9,8 +9,13 @@ Accordingly, this program optimizes a function using GAs and plots the Fitness v
 import testFunctions as tf
 import representation as rp
 import multiprocessing as mp
-from pathos.multiprocessing import ProcessingPool as Pool
-from optimizationGA import GA_SEARCH
+import os
+import random
+from optimizationGA import GA_SEARCH_BATCH
+from scheduler import run_jobs, sweep_pool
+from checkpoint import SweepCheckpoint
+from seeding import trial_streams
+from profiling import PhaseProfile
 
 # Global constants
 GRAY_CODE = rp.generateGrayRepresentation
@@ -31,41 +36,74 @@ p = 30   # population size
 g = 100 # no. of generations. Doesnt actually do anything because we run the GA until 5000 fitness evals.
 
 NUM_RUNS = 1000
+TRIALS_PER_JOB = 50   # trials of one (function, encoding) pair run together in one job, see GA_SEARCH_BATCH
+JOBS_PER_WORKER = 2   # jobs in flight per worker process
+CHECKPOINT = os.path.join("caruana_data", "sweep_checkpoint.jsonl")
+RESUME = False        # True to skip the trials CHECKPOINT lists as completed instead of starting over
+MASTER_SEED = None    # every trial's random stream is derived from this seed (see seeding.py). Random if None
+PROFILE = False       # True to time the phases of every trial and write caruana_data/profile_f*.json and .csv
 # minimization
 key = min
+
+funcs = [tf.f1, tf.f2, tf.f3, tf.f4, tf.f5]
+ranges = [(-5.12,5.11,0.01), (-2.048,2.047,0.001), (-5.12,5.11,0.01), (-1.28, 1.27, 0.01), (-65.536, 65.535, 0.001)]
+codes = {"NGG": NGG_CODE, "UBL": UBL_CODE, "BRG": GRAY_CODE, "BIN": BINARY_CODE}
+
+def run_trials(j, name, first, n, seed):
+    """
+    runs trials first, ..., first + n - 1 of function j with encoding name. Every trial draws from its own stream
+    derived from the master seed, so it can be reproduced regardless of how the sweep was split into jobs.
+    All trials of a job share one (function, encoding) pair, so the worker's representation tables stay warm.
+    Returns the profiling.PhaseProfile of the job if PROFILE is set, otherwise None
+    """
+    profile = PhaseProfile() if PROFILE else None
+    GA_SEARCH_BATCH(m, c, p, g, codes[name], "f" + str(j) + "_" + name + "_T", funcs[j-1], ranges[j-1], key,
+                    trials=n, first_trial=first, rng=trial_streams(seed, j, name, first, n), profile=profile)
+    return profile
+
+def sweep_tasks(checkpoint, seed):
+    """
+    yields the (j, name, first, n, seed) jobs of the sweep, skipping trials the checkpoint lists as completed.
+    Every job is a run of at most TRIALS_PER_JOB consecutive trials that are not completed
+    """
+    for j in range(1, len(funcs)+1):
+        for start in range(1, NUM_RUNS+1, TRIALS_PER_JOB):
+            for name in codes:
+                todo = [i for i in range(start, min(start + TRIALS_PER_JOB, NUM_RUNS + 1)) if not checkpoint.is_done(j, name, i)]
+                while todo:
+                    n = 1
+                    while n < len(todo) and todo[n] == todo[0] + n:
+                        n += 1
+                    yield (j, name, todo[0], n, seed)
+                    todo = todo[n:]
+
 def main():
-    # 5 trials
     # writes online performance to text file function_representation_trial#.txt
 
     # endpoint in interval must be end - step to make sure the number of discrete points on each axis is a power of 2
             # e.g. is literature says the search space is -5.12 <= x <= 5.12 with resolution \delta x = 0.01, input
             #       (-5.12, 5.11, 0.01) as the interval
 
+    workers = mp.cpu_count()
+    # every worker builds the representation tables once up front instead of once per trial
+    with SweepCheckpoint(CHECKPOINT, RESUME) as checkpoint, \
+         sweep_pool(workers, initializer=rp.warmRepresentationCache,
+                    initargs=([(code, r) for r in ranges for code in codes.values()],)) as pool:
+        done = checkpoint.num_done()
+        seed = MASTER_SEED if MASTER_SEED is not None else random.SystemRandom().randrange(2**63)
+        profiles = {}   # function number -> PhaseProfile merged over the jobs of all encodings
+        for (j, name, first, n, seed), profile in run_jobs(pool, run_trials, sweep_tasks(checkpoint, seed), JOBS_PER_WORKER*workers):
+            checkpoint.record(j, name, range(first, first + n), [seed]*n)
+            if profile is not None:
+                profiles.setdefault(j, PhaseProfile()).merge(profile)
+            done += n
+            print(str(funcs[j-1]) + " (" + name + ") trials " + str(first) + "-" + str(first + n - 1) + " done, "
+                  + str(done) + "/" + str(NUM_RUNS*len(funcs)*len(codes)))
 
-    pool = Pool(mp.cpu_count())
-    jobs = []
-
-    funcs = [tf.f1, tf.f2, tf.f3, tf.f4, tf.f5]
-    ranges = [(-5.12,5.11,0.01), (-2.048,2.047,0.001), (-5.12,5.11,0.01), (-1.28, 1.27, 0.01), (-65.536, 65.535, 0.001)]
-    search = lambda i,j : GA_SEARCH(m, c, p, g, GRAY_CODE, "f" + str(j) + "_BRG_T" + str(i), funcs[j-1], ranges[j-1], min)
-
-    for j in range(1, len(funcs)+1):
-        print(str(funcs[j-1]))
-        for i in range(1,NUM_RUNS+1):
-            job = pool.apipe(GA_SEARCH, m, c, p, g, NGG_CODE, "f" + str(j) + "_NGG_T" + str(i), funcs[j-1], ranges[j-1], min)
-            jobs.append(job)
-            job = pool.apipe(GA_SEARCH, m, c, p, g, UBL_CODE, "f" + str(j) + "_UBL_T" + str(i), funcs[j-1], ranges[j-1], min)
-            jobs.append(job)
-
-            job = pool.apipe(GA_SEARCH, m, c, p, g, GRAY_CODE, "f" + str(j) + "_BRG_T" + str(i), funcs[j-1], ranges[j-1], min)
-            jobs.append(job)
-            job = pool.apipe(GA_SEARCH, m, c, p, g, BINARY_CODE, "f" + str(j) + "_BIN_T" + str(i), funcs[j-1], ranges[j-1], min)
-            jobs.append(job)
-
-    for job in jobs:
-        job.get()
-#    pool.close()
-#    pool.join()
+    for j, profile in profiles.items():
+        fname = os.path.join("caruana_data", "profile_f" + str(j))
+        profile.write_json(fname + ".json")
+        profile.write_csv(fname + ".csv")
 
 if __name__ == "__main__":
     main()
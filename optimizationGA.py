@@ -5,10 +5,20 @@ Genetic Algorithm for optimization of scalar functions with vector input.
 """
 
 from chromosome import *
+from representation import cachedRepresentation
+from results import open_result_sinks, TextResultSink
+from checkpoint import save_snapshot, load_snapshot
+from seeding import get_rng
+from fitness import SerialEvaluator
+from profiling import NULL_PROFILE
+from selection import wheel_selection
+import population
 import os
 import math
+import json
 
-def GA_SEARCH(mutrate, crossrate, popsize, gens, rep, file, fn, interval, key=min):
+def GA_SEARCH(mutrate, crossrate, popsize, gens, rep, file, fn, interval, key=min, cache=None, sink=TextResultSink, rng=None,
+              evaluator=None, delta=False, profile=None, selection=wheel_selection):
     """
     Executes a genetic algorithm to optimize a mathematical function fn. Returns a pair (X,y) where X is an input vector and y is the optimized fn(X)
     mutrate -- mutation rate, between 0 and 1 inclusive
@@ -16,7 +26,7 @@ def GA_SEARCH(mutrate, crossrate, popsize, gens, rep, file, fn, interval, key=mi
     popsize -- positive even integer population size to be maintained throughout iteration
     gens -- a number greater than 0 that specifies the number of generations to iterate through
     rep -- representation function to be used (instance of Representation class). Maps from bitstrings to real numbers in the given interval
-           Pass the function object (e.g. GRAY_CODE)
+           Pass the function object (e.g. GRAY_CODE). The constructed representation is cached per process (see cachedRepresentation)
     file -- text file name to write output to (not the same as console output -- file output writes every generation, while
             console output only writes when an improvement has been made)
     fn -- the real valued mathematical function to be optimized, wrapped in a TestFn object. fn : R^n --> R (i.e. vector valued inputs, scalar valued outputs).
@@ -25,6 +35,22 @@ def GA_SEARCH(mutrate, crossrate, popsize, gens, rep, file, fn, interval, key=mi
     W -- scaling window = 1
     S -- selection strategy = E  
     key -- min for function minimization and max for function maximization 
+    cache -- optional fitness.FitnessCache, so individuals that were already scored keep their fitness instead of being
+             evaluated again. Ignored if fn is not deterministic. Read cache.hits and cache.misses afterwards for the savings
+    sink -- result sink class of results.py used for the two output files (TextResultSink or BinaryResultSink)
+    rng -- numpy Generator that every random draw of the run (initialization, selection, crossover, mutation and the
+           noise of fn) comes from, e.g. seeding.trial_rng(...). A run is reproducible from its rng. Seeded from OS entropy if None
+    evaluator -- fitness.Evaluator that scores the individuals of every generation as one batch, e.g. a
+                 fitness.ProcessPoolEvaluator for expensive objectives. fitness.SerialEvaluator if None
+    delta -- if True and fn is separable (see TestFn.is_separable), a child's fitness is computed from the per-gene terms
+             of its parents, and only the terms of the genes that differ from both parents are evaluated. Noise is still
+             drawn anew for every individual. Takes the place of evaluator; the cache, if any, still applies
+    profile -- optional profiling.PhaseProfile that records the time of every phase (representation, initialization,
+               selection, crossover, mutation, evaluation, write) in total and per generation, and counts evaluations,
+               individuals scored, cache hits and new children
+    selection -- selection strategy of selection.py that draws the mating pool: wheel_selection (the default),
+                 stochastic_universal_sampling, rank_selection or tournament_selection, e.g.
+                 functools.partial(tournament_selection, k=4)
     """
 
     assert popsize > 0, "popsize is not positive"
@@ -34,105 +60,408 @@ def GA_SEARCH(mutrate, crossrate, popsize, gens, rep, file, fn, interval, key=mi
 
 #    print("Initializing...")
 
+    prof = NULL_PROFILE if profile is None else profile
+
     # Initialize representation 
-    REP = rep(interval)
+    with prof.phase("representation"):
+        REP = cachedRepresentation(rep, interval)
+    rng = get_rng(rng)
+
+    if evaluator is None:
+        evaluator = SerialEvaluator()
+    score = lambda chroms: evaluator.evaluate(fn, [chrom.to_real_vec() for chrom in chroms], rng)
+
+    # delta evaluation: terms of the scored individuals, and the parents of every child of the current generation
+    TERMS, PARENTS = {}, {}
+    if delta and fn.is_separable():
+        def score(chroms):
+            values = []
+            for chrom in chroms:
+                sources = [(c, TERMS[c]) for c in (chrom,) + PARENTS.get(chrom, ()) if c in TERMS]
+                value, TERMS[chrom] = chrom.eval_fitness_delta(fn, sources, rng)
+                values.append(value)
+            return values
+
+    if cache is not None and fn.is_deterministic():
+        cache.bind((fn, rep, interval))
+        cached_evaluate = lambda pop: dict(zip(pop, cache.evaluate([str(chrom) for chrom in pop], lambda pos: score([pop[i] for i in pos]))))
+    else:
+        cache = None
+        cached_evaluate = lambda pop: dict(zip(pop, score(pop)))
+
+    def evaluate(pop):
+        hits = 0 if cache is None else cache.hits
+        with prof.phase("evaluation"):
+            fmap = cached_evaluate(pop)
+        prof.count("scored", len(pop))
+        if cache is not None:
+            prof.count("cache_hits", cache.hits - hits)
+        return fmap
 
 #    print(key.__name__.upper() + "IMIZING " + str(fn).upper() + " (" + REP.get_name() + ")")
 
 
-    f = open(os.path.join("caruana_data", file + ".txt"), 'w')
-    g = open(os.path.join("caruana_data", file + "best_sol" + ".txt"), 'w')
+    f, g = open_result_sinks(file, sink)
+    # the sinks are closed even if the run raises
+    with f, g:
 
-    # Initialize random population
-    EVAL_LIMIT = 5000
-    EVALS = 0
-    curr_gen = 1
-    POP = []
-    dim = fn.get_input_dimension()
+        # Initialize random population
+        EVAL_LIMIT = 5000
+        EVALS = 0
+        curr_gen = 1
+        POP = []
+        dim = fn.get_input_dimension()
 
-    for i in range(0, popsize):
-        vec = ""
-        for n in range(dim):
-            vec += REP.get_random_bitstr()
-        chrom = Chromosome(REP, vec)
-        POP.append(chrom)
+        with prof.phase("initialization"):
+            for i in range(0, popsize):
+                chrom = Chromosome(REP, REP.get_random_bitstr(rng, dim))
+                POP.append(chrom)
 
 
-    assert len(POP) == popsize, "POP has incorrect number of elements"
+        assert len(POP) == popsize, "POP has incorrect number of elements"
 
 
-    # evaluate population 
-#    print("Evolving...")
-    # Fitness map is not performance value. It is just the evaluation of the objective function to be minimized.
-    FITNESS_MAP = {chrom:chrom.eval_fitness(fn) for chrom in POP}
+        # evaluate population 
+    #    print("Evolving...")
+        # Fitness map is not performance value. It is just the evaluation of the objective function to be minimized.
+        FITNESS_MAP = evaluate(POP)
 
-    # scaling window of 1
-    if key == min:
-        best = math.inf
-        f_prime = max(FITNESS_MAP.values())
-    else:
-        best = -math.inf
-        f_prime = min(FITNESS_MAP.values())
+        # scaling window of 1
+        if key == min:
+            best = math.inf
+            f_prime = max(FITNESS_MAP.values())
+        else:
+            best = -math.inf
+            f_prime = min(FITNESS_MAP.values())
 
-    for k in POP:
-        # f.write(str(k.performance_value(FITNESS_MAP, f_prime, key)))
-        # f.write("\t")
-        f.write(str(FITNESS_MAP[k]))
-        f.write("\n")
-        EVALS += 1
+        with prof.phase("write"):
+            for k in POP:
+                # f.write(str(k.performance_value(FITNESS_MAP, f_prime, key)))
+                # f.write("\t")
+                f.write(FITNESS_MAP[k])
+                EVALS += 1
 
-    g.write(str(key(FITNESS_MAP.values())) + "\n")
-    # Evolve
-    while EVALS < EVAL_LIMIT:
-        curr_gen += 1
-        child_POP = []
-        new_children = []  # new individuals not from previous generation. Child_pop is the entire population that will replace POP.
-                            # new_children keeps track of the individuals that are not from previous generation
-        for i in range(popsize//2):
-            parent1, parent2 = wheel_selection(POP, FITNESS_MAP, f_prime, key)
-
-            if random.uniform(0,1) <= crossrate:
-                child1, child2 = parent1.crossover(parent2)
+            g.write(key(FITNESS_MAP.values()))
+        prof.count("evaluations", EVALS)
+        prof.end_generation()
+        # Evolve
+        while EVALS < EVAL_LIMIT:
+            curr_gen += 1
+            child_POP = []
+            new_children = []  # new individuals not from previous generation. Child_pop is the entire population that will replace POP.
+                                # new_children keeps track of the individuals that are not from previous generation
+            # the mating pool is drawn at once from the fitness array of the population
+            with prof.phase("selection"):
+                fitness = numpy.array([FITNESS_MAP[chrom] for chrom in POP], dtype=float)
+                parents = [POP[i] for i in selection(fitness, f_prime, key, 2*(popsize//2), rng)]
+            for i in range(popsize//2):
+                parent1, parent2 = parents[2*i], parents[2*i+1]
+
+                with prof.phase("crossover"):
+                    if rng.uniform(0,1) <= crossrate:
+                        child1, child2 = parent1.crossover(parent2, rng)
+                    else:
+                        child1, child2 = parent1, parent2
+
+                with prof.phase("mutation"):
+                    child1 = child1.mutate(mutrate, rng)
+                    child2 = child2.mutate(mutrate, rng)
+
+                PARENTS[child1] = PARENTS[child2] = (parent1, parent2)
+
+                if child1 != parent1 and child1 != parent2:
+                    new_children.append(child1)
+                if child2 != parent1 and child2 != parent2:
+                    new_children.append(child2)
+
+
+                child_POP.append(child1)
+                child_POP.append(child2)
+
+            # elitist replacement
+            best_chrom = key(FITNESS_MAP, key = FITNESS_MAP.get)
+            if best_chrom not in child_POP:
+                child_POP.append(best_chrom)
+
+            POP = child_POP.copy()
+
+            assert len(POP) == popsize or len(POP) == popsize + 1, "popsize not maintained after next generation"
+            FITNESS_MAP = evaluate(POP)
+            if TERMS:
+                # only the current population can be a parent in the next generation
+                for chrom in set(TERMS).difference(POP):
+                    del TERMS[chrom]
+            PARENTS.clear()
+
+            # scaling window of 1, so recompute f_prime every generation
+            if key == min:
+                f_prime = max(FITNESS_MAP.values())
             else:
-                child1, child2 = parent1, parent2
+                f_prime = min(FITNESS_MAP.values())
 
-            child1 = child1.mutate(mutrate)
-            child2 = child2.mutate(mutrate)
+            prof.count("new_children", len(new_children))
+            written = EVALS
+            with prof.phase("write"):
+                for new in new_children:
+                    # f.write(str(new.performance_value(FITNESS_MAP, f_prime, key)))
+                    # f.write("\t")
+                    f.write(FITNESS_MAP[new])
+                    EVALS += 1
+                    if EVALS == EVAL_LIMIT:
+                        break 
 
-            if child1 != parent1 and child1 != parent2:
-                new_children.append(child1)
-            if child2 != parent1 and child2 != parent2:
-                new_children.append(child2)
+                g.write(key(FITNESS_MAP.values()))
+            prof.count("evaluations", EVALS - written)
+            prof.end_generation()
 
+        # closed here already so that flushing the sinks counts as writing
+        with prof.phase("write"):
+            f.close()
+            g.close()
+    prof.end_run()
+#    print("All " + str(EVALS) + " fitness evals completed")
 
-            child_POP.append(child1)
-            child_POP.append(child2)
 
-        # elitist replacement
-        best_chrom = key(FITNESS_MAP, key = FITNESS_MAP.get)
-        if best_chrom not in child_POP:
-            child_POP.append(best_chrom)
 
-        POP = child_POP.copy()
+def GA_SEARCH_ARRAY(mutrate, crossrate, popsize, gens, rep, file, fn, interval, key=min, crossover=population.one_point_crossover,
+                    cache=None, sink=TextResultSink, snapshot=None, snapshot_every=10, rng=None, delta=False,
+                    selection=wheel_selection):
+    """
+    Same genetic algorithm as GA_SEARCH, with the same parameters, statistics and output files, but the population
+    is kept as one bit matrix (see population.py) and every generation step works on the whole matrix at once.
+    crossover -- crossover operator of population.py (one_point_crossover, two_point_crossover or uniform_crossover)
+    cache -- optional fitness.FitnessCache, as in GA_SEARCH
+    sink -- result sink class, as in GA_SEARCH
+    snapshot -- optional path of a .npz file. The state of the run is saved there every snapshot_every generations,
+                and if the file exists when the run starts, the run continues from it instead of starting over.
+                The file is removed once the run completes
+    rng -- numpy Generator, as in GA_SEARCH
+    delta -- delta evaluation, as in GA_SEARCH (see population.evaluate_population_delta). Not combined with cache
+    selection -- selection strategy, as in GA_SEARCH
+    """
+
+    assert popsize > 0, "popsize is not positive"
+    assert 0 <= mutrate and mutrate <= 1, "invalid mutation rate"
+    assert 0 <= crossrate and crossrate <= 1, "invalid crossover rate"
+    assert gens > 0, "num of generations not positive"
+
+    # Initialize representation
+    REP = cachedRepresentation(rep, interval)
+    delta = delta and fn.is_separable()
+    if cache is not None and fn.is_deterministic() and not delta:
+        cache.bind((fn, rep, interval))
+    else:
+        cache = None
+    TERMS = None   # per-gene terms of the population for delta evaluation
+    rng = get_rng(rng)
+    best_index = numpy.argmin if key == min else numpy.argmax
 
-        assert len(POP) == popsize or len(POP) == popsize + 1, "popsize not maintained after next generation"
-        FITNESS_MAP = {chrom:chrom.eval_fitness(fn) for chrom in POP}
+    f, g = open_result_sinks(file, sink)
+    with f, g:
 
-        # scaling window of 1, so recompute f_prime every generation
-        if key == min:
-            f_prime = max(FITNESS_MAP.values())
+        EVAL_LIMIT = 5000
+        online, best_sol = [], []   # everything written so far, kept for snapshots
+        if snapshot is not None and os.path.exists(snapshot):
+            # continue an interrupted run: rewrite its outputs so far and restore the population and RNG
+            state = load_snapshot(snapshot)
+            POP, FITNESS, f_prime = state["POP"], state["FITNESS"], state["f_prime"]
+            EVALS, curr_gen = int(state["EVALS"]), int(state["curr_gen"])
+            online, best_sol = state["online"].tolist(), state["best_sol"].tolist()
+            rng.bit_generator.state = json.loads(str(state["rng_state"]))
+            f.write_many(online)
+            g.write_many(best_sol)
         else:
-            f_prime = min(FITNESS_MAP.values())
+            # Initialize random population
+            EVALS = 0
+            curr_gen = 1
+            dim = fn.get_input_dimension()
+            POP = population.random_population(REP, popsize, dim, rng=rng)
 
-        for new in new_children:
-            # f.write(str(new.performance_value(FITNESS_MAP, f_prime, key)))
-            # f.write("\t")
-            f.write(str(FITNESS_MAP[new]))
-            f.write("\n")
-            EVALS += 1
-            if EVALS == EVAL_LIMIT:
-                break 
+            assert len(POP) == popsize, "POP has incorrect number of elements"
 
-        g.write(str(key(FITNESS_MAP.values())) + "\n")
+            if delta:
+                FITNESS, TERMS = population.evaluate_population_delta(POP, REP, fn, [], rng)
+            else:
+                FITNESS = population.evaluate_population(POP, REP, fn, cache, rng)
 
-#    print("All " + str(EVALS) + " fitness evals completed")
+            # scaling window of 1
+            if key == min:
+                f_prime = FITNESS.max()
+            else:
+                f_prime = FITNESS.min()
+
+            f.write_many(FITNESS.tolist())
+            EVALS += len(FITNESS)
+
+            g.write(key(FITNESS.tolist()))
+            if snapshot is not None:
+                online += FITNESS.tolist()
+                best_sol.append(key(FITNESS.tolist()))
+        # Evolve
+        while EVALS < EVAL_LIMIT:
+            curr_gen += 1
+            npairs = popsize//2
+            parents = selection(FITNESS, f_prime, key, 2*npairs, rng)
+            child1, child2 = crossover(POP[parents[0::2]], POP[parents[1::2]], crossrate, rng)
+
+            # children are interleaved so that row order matches GA_SEARCH
+            children = numpy.empty((2*npairs, POP.shape[1]), dtype=numpy.uint8)
+            children[0::2] = child1
+            children[1::2] = child2
+            children = population.mutate(children, mutrate, rng)
+
+            # elitist replacement. Every child is a new individual, so the elite is always appended.
+            elite = best_index(FITNESS)
+            if delta:
+                if TERMS is None:
+                    # resumed from a snapshot, which does not hold the terms. They carry no noise, so rebuilding them
+                    # draws nothing from the restored rng
+                    TERMS = population.population_terms(POP, REP, fn)
+                # rows 2i and 2i+1 are the children of parents 2i and 2i+1, the last row is the elite
+                first = numpy.append(parents[0::2].repeat(2), elite)
+                second = numpy.append(parents[1::2].repeat(2), elite)
+                sources = [(POP[first], TERMS[first]), (POP[second], TERMS[second])]
+            POP = numpy.vstack((children, POP[elite]))
+
+            assert len(POP) == popsize or len(POP) == popsize + 1, "popsize not maintained after next generation"
+            if delta:
+                FITNESS, TERMS = population.evaluate_population_delta(POP, REP, fn, sources, rng)
+            else:
+                FITNESS = population.evaluate_population(POP, REP, fn, cache, rng)
+
+            # scaling window of 1, so recompute f_prime every generation
+            if key == min:
+                f_prime = FITNESS.max()
+            else:
+                f_prime = FITNESS.min()
+
+            new = min(len(children), EVAL_LIMIT - EVALS)
+            f.write_many(FITNESS[:new].tolist())
+            EVALS += new
+
+            g.write(key(FITNESS.tolist()))
+
+            if snapshot is not None:
+                online += FITNESS[:new].tolist()
+                best_sol.append(key(FITNESS.tolist()))
+                if curr_gen % snapshot_every == 0:
+                    save_snapshot(snapshot, POP=POP, FITNESS=FITNESS, f_prime=f_prime, EVALS=EVALS, curr_gen=curr_gen,
+                                  online=online, best_sol=best_sol, rng_state=json.dumps(rng.bit_generator.state))
+
+    if snapshot is not None and os.path.exists(snapshot):
+        os.remove(snapshot)
+
+
+
+def GA_SEARCH_BATCH(mutrate, crossrate, popsize, gens, rep, file, fn, interval, key=min, trials=1, first_trial=1,
+                    crossover=population.one_point_crossover, cache=None, sink=TextResultSink, store=None, rng=None,
+                    profile=None):
+    """
+    Runs trials independent copies of GA_SEARCH_ARRAY together. The populations of all trials are stacked into one
+    (trials, popsize, dim*b) array, and selection, crossover, mutation and evaluation run on every trial at once.
+
+    The parameters are the same as GA_SEARCH_ARRAY, except that file is a prefix: trial i writes the usual two output files
+    named file + str(i), for i = first_trial, ..., first_trial + trials - 1 (e.g. file = "f1_BRG_T" gives f1_BRG_T1.txt).
+
+    store -- optional sweep_store.SweepStore. If given, the outputs are written to its rows first_trial, ... instead of
+             to per-trial files
+    rng -- numpy Generator shared by all trials, or a seeding.TrialStreams with one stream per trial (see
+           seeding.trial_streams) so that every trial is reproducible on its own
+    profile -- optional profiling.PhaseProfile, as in GA_SEARCH. The phases cover all trials at once
+    """
+
+    assert popsize > 0, "popsize is not positive"
+    assert 0 <= mutrate and mutrate <= 1, "invalid mutation rate"
+    assert 0 <= crossrate and crossrate <= 1, "invalid crossover rate"
+    assert gens > 0, "num of generations not positive"
+    assert trials > 0, "num of trials not positive"
+
+    prof = NULL_PROFILE if profile is None else profile
+
+    # Initialize representation
+    with prof.phase("representation"):
+        REP = cachedRepresentation(rep, interval)
+    if cache is not None and fn.is_deterministic():
+        cache.bind((fn, rep, interval))
+    else:
+        cache = None
+
+    def evaluate(POP):
+        hits = 0 if cache is None else cache.hits
+        with prof.phase("evaluation"):
+            FITNESS = population.evaluate_population(POP, REP, fn, cache, rng)
+        prof.count("scored", FITNESS.size)
+        if cache is not None:
+            prof.count("cache_hits", cache.hits - hits)
+        return FITNESS
+    rng = get_rng(rng)
+    best_index = numpy.argmin if key == min else numpy.argmax
+    window = numpy.max if key == min else numpy.min
+    best_value = numpy.min if key == min else numpy.max
+
+    # Initialize random populations
+    EVAL_LIMIT = 5000
+    EVALS = 0
+    curr_gen = 1
+    dim = fn.get_input_dimension()
+    with prof.phase("initialization"):
+        POP = population.random_population(REP, popsize, dim, trials, rng)
+
+    FITNESS = evaluate(POP)
+
+    # scaling window of 1
+    f_prime = window(FITNESS, axis = 1)
+
+    # online (per evaluation) and best solution (per generation) outputs of every trial
+    online = [FITNESS]
+    best_sol = [best_value(FITNESS, axis = 1)]
+    EVALS += popsize
+    prof.count("evaluations", trials*popsize)
+    prof.end_generation()
+
+    # Evolve
+    trial_index = numpy.arange(trials)
+    while EVALS < EVAL_LIMIT:
+        curr_gen += 1
+        npairs = popsize//2
+        with prof.phase("selection"):
+            parents = population.wheel_selection_batch(FITNESS, f_prime, key, 2*npairs, rng)
+        with prof.phase("crossover"):
+            child1, child2 = crossover(POP[trial_index[:, None], parents[:, 0::2]],
+                                       POP[trial_index[:, None], parents[:, 1::2]], crossrate, rng)
+
+            children = numpy.empty((trials, 2*npairs, POP.shape[2]), dtype=numpy.uint8)
+            children[:, 0::2] = child1
+            children[:, 1::2] = child2
+        with prof.phase("mutation"):
+            children = population.mutate(children, mutrate, rng)
+
+        # elitist replacement
+        elite = POP[trial_index, best_index(FITNESS, axis = 1)]
+        POP = numpy.concatenate((children, elite[:, None]), axis = 1)
+
+        FITNESS = evaluate(POP)
+
+        # scaling window of 1, so recompute f_prime every generation
+        f_prime = window(FITNESS, axis = 1)
+
+        new = min(2*npairs, EVAL_LIMIT - EVALS)
+        online.append(FITNESS[:, :new])
+        best_sol.append(best_value(FITNESS, axis = 1))
+        EVALS += new
+        prof.count("new_children", trials*2*npairs)
+        prof.count("evaluations", trials*new)
+        prof.end_generation()
+
+    online = numpy.concatenate(online, axis = 1)
+    best_sol = numpy.stack(best_sol, axis = 1)
+    with prof.phase("write"):
+        if store is not None:
+            store.write_trials(first_trial, online, best_sol)
+        else:
+            for t in range(trials):
+                f, g = open_result_sinks(file + str(first_trial + t), sink)
+                with f, g:
+                    f.write_many(online[t].tolist())
+                    g.write_many(best_sol[t].tolist())
+    prof.end_run(trials)
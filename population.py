@@ -0,0 +1,176 @@
+"""
+Array-backed population for the GA.
+
+A population is stored as a single (popsize, dim*b) numpy uint8 matrix of 0/1 bits instead
+of a list of Chromosome objects. Row i is individual i, and every consecutive run of b columns
+is the code word of one gene, exactly as in the bitstring held by a Chromosome. The functions
+here implement the genetic operators of chromosome.py on the whole matrix at once.
+
+Independent trials can be stacked into a (trials, popsize, dim*b) array. Every operator except
+wheel_selection also works on such stacks, and wheel_selection_batch selects for all trials at once.
+
+Every function that draws random numbers takes a numpy Generator rng (see seeding.py). For stacks of
+trials, rng may be a seeding.TrialStreams so that each trial draws from its own stream.
+"""
+import numpy
+from representation import codesToBits, bitsToCodes
+from selection import performance_values, wheel_selection   # part of the population operators
+from seeding import get_rng, TrialStreams
+
+
+def random_population(rep, popsize, dim, trials = None, rng = None):
+    """
+    returns a (popsize, dim*b) bit matrix where every gene is a code word drawn uniformly from rep.
+    If trials is given, returns a (trials, popsize, dim*b) stack of independent populations.
+    """
+    shape = (popsize, dim) if trials is None else (trials, popsize, dim)
+    codes = get_rng(rng).choice(rep.get_inverse_table(), shape)
+    return codesToBits(codes, rep.num_bits())
+
+
+def evaluate_population(bits, rep, fn, cache = None, rng = None):
+    """
+    returns a numpy array with the fitness of every row of the bit matrix (or stack of matrices) under TestFn fn
+    rep -- Representation object used to decode the rows
+    cache -- optional fitness.FitnessCache. Only rows that are not in the cache are decoded and evaluated
+    rng -- random stream for the noise of fn, if any
+    """
+    if cache is None:
+        X = rep.decode(bits)
+        return fn.eval_batch(X.reshape(-1, X.shape[-1]), rng).reshape(X.shape[:-1])
+
+    rows = bits.reshape(-1, bits.shape[-1])
+    compute = lambda pos: fn.eval_batch(rep.decode(rows[pos]), rng).tolist()
+    return numpy.array(cache.evaluate([row.tobytes() for row in rows], compute)).reshape(bits.shape[:-1])
+
+
+def evaluate_population_delta(bits, rep, fn, sources, rng = None):
+    """
+    delta evaluation of a (popsize, dim*b) bit matrix under a separable TestFn fn (see TestFn.is_separable).
+    Every gene that equals the same gene of the same row of a source takes the source's term, and only the terms
+    of the remaining genes are computed. Noise, if fn has any, is drawn anew for every row.
+    Returns the fitness array and the (popsize, dim) array of terms.
+    sources -- list of (source_bits, source_terms) pairs aligned with the rows of bits, e.g. the parents of every child
+    """
+    codes = bitsToCodes(bits, rep.num_bits())
+    terms = numpy.empty(codes.shape)
+    todo = numpy.ones(codes.shape, dtype = bool)
+    for source_bits, source_terms in sources:
+        same = todo & (bitsToCodes(source_bits, rep.num_bits()) == codes)
+        terms[same] = source_terms[same]
+        todo &= ~same
+    terms[todo] = fn.eval_terms_batch(numpy.nonzero(todo)[1], rep.get_table()[codes[todo]])
+    return fn.from_terms_batch(terms, rng), terms
+
+
+def population_terms(bits, rep, fn):
+    """
+    the (popsize, dim) array of terms of every row of a bit matrix under a separable TestFn fn, e.g. to rebuild the
+    terms of a restored population for evaluate_population_delta. No noise is drawn
+    """
+    codes = bitsToCodes(bits, rep.num_bits())
+    genes = numpy.broadcast_to(numpy.arange(codes.shape[1]), codes.shape)
+    return fn.eval_terms_batch(genes.ravel(), rep.get_table()[codes].ravel()).reshape(codes.shape)
+
+
+def wheel_selection_batch(fitness, f_prime, key, n, rng = None):
+    """
+    wheel_selection for a stack of independent trials. fitness is a (trials, popsize) array and f_prime
+    holds the scaling window value of every trial. Returns a (trials, n) array of row indices.
+    """
+    trials, popsize = fitness.shape
+    w = performance_values(fitness, f_prime[:, None], key)
+    w[w.sum(axis = 1) == 0] = 1   # uniform selection for trials with zero total weight
+    cum = numpy.cumsum(w, axis = 1)
+    cum /= cum[:, -1:]
+    u = get_rng(rng).uniform(0, 1, (trials, n))
+    # the pick of a draw u is the number of cumulative sums <= u (a binary search per trial). Every trial is
+    # searched on its own, so its picks do not depend on the other trials in the stack
+    if trials*n*popsize <= 1 << 22:
+        picks = (cum[:, None, :] <= u[:, :, None]).sum(axis = 2)
+    else:
+        picks = numpy.array([numpy.searchsorted(c, v, side = 'right') for c, v in zip(cum, u)])
+    return numpy.minimum(picks, popsize - 1)
+
+
+def _recombine(parents1, parents2, mask, crossrate, rng):
+    """
+    builds the two children of every pair from a bit mask, where child 1 takes parents1's bit wherever mask is True
+    and parents2's bit elsewhere (child 2 the other way around). Each pair is crossed with probability crossrate,
+    otherwise both parents are copied.
+    """
+    mask[rng.uniform(0, 1, mask.shape[:-1]) > crossrate] = True
+    child1 = numpy.where(mask, parents1, parents2)
+    child2 = numpy.where(mask, parents2, parents1)
+    return child1, child2
+
+
+def one_point_crossover(parents1, parents2, crossrate, rng = None):
+    """
+    One point crossover of every pair of rows (parents1[i], parents2[i]), the same operator as Chromosome.crossover.
+    Each pair is crossed with probability crossrate, otherwise both parents are copied. Returns the two child matrices.
+    """
+    rng = get_rng(rng)
+    l = parents1.shape[-1]
+    points = rng.integers(0, l + 1, parents1.shape[:-1])
+    mask = numpy.arange(l) < points[..., None]
+    return _recombine(parents1, parents2, mask, crossrate, rng)
+
+
+def two_point_crossover(parents1, parents2, crossrate, rng = None):
+    """
+    Two point crossover of every pair of rows: the bits between two random cut points are swapped.
+    Each pair is crossed with probability crossrate, otherwise both parents are copied. Returns the two child matrices.
+    """
+    rng = get_rng(rng)
+    l = parents1.shape[-1]
+    points = numpy.sort(rng.integers(0, l + 1, parents1.shape[:-1] + (2,)), axis = -1)
+    cols = numpy.arange(l)
+    mask = (cols < points[..., :1]) | (cols >= points[..., 1:])
+    return _recombine(parents1, parents2, mask, crossrate, rng)
+
+
+def uniform_crossover(parents1, parents2, crossrate, rng = None):
+    """
+    Uniform crossover of every pair of rows: every bit is swapped with probability 1/2.
+    Each pair is crossed with probability crossrate, otherwise both parents are copied. Returns the two child matrices.
+    """
+    rng = get_rng(rng)
+    mask = rng.uniform(0, 1, parents1.shape) < 0.5
+    return _recombine(parents1, parents2, mask, crossrate, rng)
+
+
+# mutation rates below this flip so few bits that sampling the gaps between flips beats drawing a mask
+SPARSE_MUTATION_RATE = 0.05
+
+def mutate(bits, pm, rng = None):
+    """
+    multi-bit mutation of every row. Each bit is flipped with probability pm. Returns a new matrix.
+    """
+    if pm < SPARSE_MUTATION_RATE:
+        return mutate_sparse(bits, pm, rng)
+    return bits ^ (get_rng(rng).uniform(0, 1, bits.shape) <= pm).astype(numpy.uint8)
+
+
+def mutate_sparse(bits, pm, rng = None):
+    """
+    same as mutate, but instead of one random number per bit, draws the geometrically distributed gaps
+    between consecutive flipped bits of the whole (flattened) array, so the cost is proportional to the
+    number of flips. With TrialStreams, every trial of the stack is mutated from its own stream.
+    """
+    if isinstance(rng, TrialStreams):
+        return numpy.stack([mutate_sparse(trial, pm, r) for trial, r in zip(bits, rng)])
+    rng = get_rng(rng)
+    mutant = bits.copy()
+    if pm <= 0:
+        return mutant
+    flat = mutant.reshape(-1)
+    n = len(flat)
+    expected = n*pm
+    pos = -1
+    while pos < n:
+        gaps = rng.geometric(pm, int(expected + 4*expected**0.5) + 16)
+        flips = pos + numpy.cumsum(gaps)
+        pos = flips[-1]
+        flat[flips[flips < n]] ^= 1
+    return mutant
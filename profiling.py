@@ -0,0 +1,151 @@
+"""
+Opt-in per-phase instrumentation of GA runs.
+
+Pass a PhaseProfile as the profile argument of GA_SEARCH or GA_SEARCH_BATCH to record how much time the run spends
+in each phase (representation construction, initialization, selection, crossover, mutation, evaluation, writing
+results), in total and per generation, along with counters such as evaluations, cache hits and new children.
+Profiles are plain picklable objects, so sweep workers return them and the parent merges them.
+Without a profile the GA uses NULL_PROFILE, whose timers do nothing.
+"""
+import csv
+import json
+import time
+
+
+class _PhaseTimer:
+    """
+    context manager that adds the time spent in its block to one phase of a PhaseProfile
+    """
+    __slots__ = ("_profile", "_name", "_start")
+
+    def __init__(self, profile, name):
+        self._profile = profile
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self._profile.add_time(self._name, time.perf_counter() - self._start)
+
+
+class PhaseProfile:
+    """
+    Timers and counters of the phases of one or more GA runs.
+
+    seconds -- phase -> total seconds
+    counts -- counter -> total
+    generations -- list with the {phase: seconds} of every generation (summed over runs for merged profiles)
+    runs -- number of runs profiled
+    """
+    def __init__(self):
+        self.seconds = {}
+        self.counts = {}
+        self.generations = []
+        self.runs = 0
+        self._timers = {}
+        self._current = {}
+
+    def phase(self, name):
+        """
+        returns a context manager that times its block as phase name, e.g. with profile.phase("selection"): ...
+        """
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _PhaseTimer(self, name)
+        return timer
+
+    def add_time(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self._current[name] = self._current.get(name, 0.0) + seconds
+
+    def count(self, name, n = 1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def end_generation(self):
+        """
+        closes the current generation: the phase times since the previous call become its entry in generations
+        """
+        self.generations.append(self._current)
+        self._current = {}
+
+    def end_run(self, n = 1):
+        self.runs += n
+
+    def merge(self, other):
+        """
+        adds the timers and counters of other to self. Generation i of both is summed, so merged generation times
+        divided by runs are the average time of generation i
+        """
+        for name, seconds in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        for name, n in other.counts.items():
+            self.counts[name] = self.counts.get(name, 0) + n
+        for i, gen in enumerate(other.generations):
+            if i == len(self.generations):
+                self.generations.append({})
+            for name, seconds in gen.items():
+                self.generations[i][name] = self.generations[i].get(name, 0.0) + seconds
+        self.runs += other.runs
+        return self
+
+    def to_dict(self):
+        return {"runs": self.runs, "seconds": self.seconds, "counts": self.counts, "generations": self.generations}
+
+    def write_json(self, fname):
+        with open(fname, "w") as f:
+            json.dump(self.to_dict(), f, indent = 1)
+
+    def write_csv(self, fname):
+        """
+        writes one row per (scope, name, value): scope is "total" for phase times, "count" for counters and the
+        generation number for per generation phase times
+        """
+        with open(fname, "w", newline = "") as f:
+            writer = csv.writer(f)
+            writer.writerow(["scope", "name", "value"])
+            for name, seconds in self.seconds.items():
+                writer.writerow(["total", name, seconds])
+            for name, n in self.counts.items():
+                writer.writerow(["count", name, n])
+            for i, gen in enumerate(self.generations, 1):
+                for name, seconds in gen.items():
+                    writer.writerow([i, name, seconds])
+
+    def __getstate__(self):
+        # timers refer back to the profile and are rebuilt on demand
+        state = self.__dict__.copy()
+        state["_timers"] = {}
+        return state
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+class _NullProfile:
+    """
+    stands in for a PhaseProfile when profiling is off. Every method does nothing
+    """
+    _timer = _NullTimer()
+
+    def phase(self, name):
+        return self._timer
+
+    def count(self, name, n = 1):
+        pass
+
+    def end_generation(self):
+        pass
+
+    def end_run(self, n = 1):
+        pass
+
+
+NULL_PROFILE = _NullProfile()
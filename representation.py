@@ -5,30 +5,86 @@ May 2019
 
 Implementation of an interface between the lower level representations and real numbers
 """
-from sympy.combinatorics.graycode import GrayCode 
 import math
 import random
-import itertools
 import pickle
+import collections
+import os
+import numpy
+import landscape
+import enumeration
 
 
 class Representation:
     """
     Takes a representation function r that maps from the a set of b-bit bitstrings
     to some real interval.
+
+    Instead of r, the representation can be given as an array of integer code words (codes) and the
+    interval, see representationFromCodes. The bitstring dictionaries are then only built the first
+    time a bitstring method needs them.
     """
-    def __init__(self, repFn, name):
+    def __init__(self, repFn, name, codes = None, interval = None):
         self._rep = repFn   # bitstr maps to number
-        self._invRep = {v: k for k, v in repFn.items()} # number maps to bitstr
+        self._invRep = None if repFn is None else {v: k for k, v in repFn.items()} # number maps to bitstr
         self._name = name 
+        self._codes = codes
+        self._interval = interval
+        self._table = None
+        self._invTable = None
+
+    def _build_dicts(self):
+        b = self.num_bits()
+        self._rep = initializeEncodings([format(c, '0' + str(b) + 'b') for c in self._codes.tolist()], self._interval)
+        self._invRep = {v: k for k, v in self._rep.items()}
 
     def to_num(self, bitstr):
-        return self._rep[bitstr]
+        return self.get_rep()[bitstr]
+
+    def get_table(self):
+        """
+        returns a numpy array t of length 2^b where t[i] is the number that the code word with integer
+        value i maps to. Code words that are not in the representation map to nan.
+        """
+        if self._table is None:
+            table = numpy.full(2**self.num_bits(), numpy.nan)
+            if self._codes is not None:
+                # same arithmetic as initializeEncodings
+                step = self._interval[2]
+                table[self._codes] = (numpy.arange(len(self._codes)) + int(self._interval[0]/step))*step
+            else:
+                for bitstr, num in self._rep.items():
+                    table[int(bitstr, 2)] = num
+            self._table = table
+        return self._table
+
+    def get_inverse_table(self):
+        """
+        returns a numpy array of the integer code words ordered by the number they map to, so that
+        get_table()[get_inverse_table()] lists the numbers in the interval in increasing order.
+        """
+        if self._invTable is None:
+            if self._codes is not None:
+                self._invTable = self._codes if self._interval[2] > 0 else self._codes[::-1]
+            else:
+                self._invTable = numpy.array([int(self._invRep[num], 2) for num in sorted(self._invRep)], dtype=numpy.int64)
+        return self._invTable
+
+    def decode(self, bits):
+        """
+        bulk genotype to phenotype mapping. bits is a (..., dim*b) array of 0/1 bits (e.g. a population bit matrix)
+        and the result is the (..., dim) array of numbers that each b-bit code word maps to.
+        """
+        return self.get_table()[bitsToCodes(bits, self.num_bits())]
 
     def get_rep(self):
+        if self._rep is None:
+            self._build_dicts()
         return self._rep
 
     def to_bitstr(self, num):
+        if self._invRep is None:
+            self._build_dicts()
         return self._invRep[num]
 
     def get_neighbors(self, bitstr):
@@ -42,10 +98,20 @@ class Representation:
         return neighbs 
 
     def num_bits(self):
+        if self._rep is None:
+            return len(self._codes).bit_length() - 1
         return len(next(iter(self._rep)))
 
-    def get_random_bitstr(self):
-        return random.choice(list(self._rep))
+    def get_random_bitstr(self, rng = None, n = 1):
+        # returns n random bitstrings of the representation, concatenated
+        # rng -- numpy Generator to draw from. Uses the random module if None
+        if rng is None:
+            bitstrs = list(self.get_rep())
+            return "".join(random.choice(bitstrs) for _ in range(n))
+        b = self.num_bits()
+        words = rng.choice(self.get_inverse_table(), n).astype(numpy.int64)
+        bits = ((words[:, None] >> numpy.arange(b - 1, -1, -1)) & 1).astype(numpy.uint8)
+        return (bits + ord("0")).tobytes().decode()
 
     def get_name(self):
         return self._name
@@ -53,10 +119,68 @@ class Representation:
     def is_valid(self, i):
         # Checks if a bitstring i is valid in the real interval. If i is a number,
         # checks if i has a valid bit representation
+        if self._rep is None:
+            self._build_dicts()
         return (i in self._rep) or (i in self._invRep)
 
     def __str__(self):
-        return str(self._rep)
+        return str(self.get_rep())
+
+
+
+def codesToBits(codes, b):
+    """
+    expands an integer array of code words into their bits. A (..., dim) array of codes
+    becomes a (..., dim*b) uint8 array of bits, most significant bit first.
+    """
+    shifts = numpy.arange(b - 1, -1, -1)
+    bits = (numpy.asarray(codes)[..., None] >> shifts) & 1
+    return bits.reshape(bits.shape[:-2] + (bits.shape[-2]*b,)).astype(numpy.uint8)
+
+
+def bitsToCodes(bits, b):
+    """
+    inverse of codesToBits. A (..., dim*b) array of bits becomes a (..., dim) array of integer code words.
+    """
+    weights = 1 << numpy.arange(b - 1, -1, -1)
+    genes = bits.reshape(bits.shape[:-1] + (bits.shape[-1]//b, b))
+    return genes.astype(numpy.int64) @ weights
+
+
+
+# Process-wide cache of constructed representations, see cachedRepresentation
+REP_CACHE_SIZE = 32
+_repCache = collections.OrderedDict()
+
+def cachedRepresentation(repFn, interval, b = None):
+    """
+    returns repFn(interval, b), reusing the Representation built by an earlier call with the same
+    factory, interval and number of bits. The least recently used entry is dropped once the cache
+    holds more than REP_CACHE_SIZE representations.
+
+    Only deterministic factories should go through the cache (e.g. not generateRandomRepresentation),
+    since every caller shares the same Representation object.
+    """
+    key = (repFn, tuple(interval), numBitsToEncodeInterval(interval) if b is None else b)
+    if key in _repCache:
+        _repCache.move_to_end(key)
+        return _repCache[key]
+
+    rep = repFn(interval) if b is None else repFn(interval, b)
+    rep.get_table()
+    _repCache[key] = rep
+    if len(_repCache) > REP_CACHE_SIZE:
+        _repCache.popitem(last = False)
+    return rep
+
+
+def warmRepresentationCache(pairs):
+    """
+    builds the representation for every (repFn, interval) pair in pairs so that later
+    cachedRepresentation calls in this process are hits. Meant as a worker pool initializer.
+    """
+    for repFn, interval in pairs:
+        cachedRepresentation(repFn, interval)
 
 
 
@@ -119,6 +243,22 @@ def numBitsToEncodeInterval(interval):
 
 
 
+def grayCodes(b):
+    """
+    returns the binary reflected Gray code on b bits as a numpy array of integer code words:
+    the code word of the i-th number is i ^ (i >> 1)
+    """
+    i = numpy.arange(2**b, dtype = numpy.int64)
+    return i ^ (i >> 1)
+
+
+def binaryCodes(b):
+    """
+    returns the standard binary code on b bits as a numpy array of integer code words
+    """
+    return numpy.arange(2**b, dtype = numpy.int64)
+
+
 def generateGrayRepresentation(interval, b = None):
     """
     returns gray code as an instance of the Representation class 
@@ -126,9 +266,7 @@ def generateGrayRepresentation(interval, b = None):
     """
     if b is None:
         b = numBitsToEncodeInterval(interval)
-    gc = list(GrayCode(b).generate_gray())
-    grayRep = initializeEncodings(gc, interval)
-    return Representation(grayRep, "binary reflected gray")
+    return representationFromCodes(grayCodes(b), interval, "binary reflected gray")
 
 
 
@@ -139,72 +277,86 @@ def generateBinaryRepresentation(interval, b = None):
     """
     if b is None:
         b = numBitsToEncodeInterval(interval)
-    bc = []
-    for i in range(0,2**b):
-        binstr = bin(i)[2:]
-        bc.append(('0'*(b-len(binstr))+binstr))
+    return representationFromCodes(binaryCodes(b), interval, "binary")
+
+def representationFromCodes(codes, interval, name):
+    """
+    Creates a Representation from a numpy array of integer code words, where codes[k] is the code word
+    of the k-th number in the interval (the same order as the encoding passed to initializeEncodings).
+    codes must hold all 2^b code words. The array is used as is, so a memory-mapped array is not copied.
+    """
+    if not isValidInterval(interval):
+        raise ValueError("bad interval")
+    start = interval[0]
+    end = interval[1]
+    step = interval[2]
+    assert len(codes) == round(abs((end - start)/step) + 1), "More items in the interval than there are bitstrings in encoding"
+    return Representation(None, name, codes = codes, interval = interval)
+
+
+def loadPrecomputedEncoding(prefix, b):
+    """
+    returns the precomputed encoding prefix_b (e.g. NGG_17) as a numpy array of integer code words.
+    The compact prefix_b.npy file is memory-mapped read only, so worker processes share it through the
+    page cache. Falls back to the legacy pickled list of bitstrings in prefix_b.txt.
+    """
+    fname = prefix + "_" + str(b)
+    if os.path.exists(fname + ".npy"):
+        return numpy.load(fname + ".npy", mmap_mode = 'r')
+    if os.path.exists(fname + ".txt"):
+        with open(fname + ".txt", 'rb') as f:
+            return numpy.array([int(bitstr, 2) for bitstr in pickle.load(f)], dtype = numpy.uint32)
+    raise ValueError("interval does not support any of the precomputed " + prefix + " reps. May need to add")
+
+
+def convertPickledEncoding(prefix, b):
+    """
+    writes the legacy pickled encoding prefix_b.txt to the compact prefix_b.npy format
+    """
+    with open(prefix + "_" + str(b) + ".txt", 'rb') as f:
+        codes = numpy.array([int(bitstr, 2) for bitstr in pickle.load(f)], dtype = numpy.uint32)
+    numpy.save(prefix + "_" + str(b) + ".npy", codes)
+
+
+def loadOrBuildEncoding(prefix, b):
+    """
+    returns the precomputed encoding prefix_b if there is one, and otherwise an encoding of the same style
+    constructed on demand (see encoding_search.py), which is built once and then read from the cache directory
+    """
+    try:
+        return loadPrecomputedEncoding(prefix, b)
+    except ValueError:
+        import encoding_search
+        return encoding_search.cached_encoding(prefix, b)
 
-    binRep = initializeEncodings(bc, interval)
-    return Representation(binRep, "binary")
 
 def generateUBL(interval, b = None):
     if b is None:
         b = numBitsToEncodeInterval(interval)
-    if b == 10:
-        fname = "UBL_10.txt"
-    elif b == 12:
-        fname = "UBL_12.txt"
-    elif b == 8:
-        fname = "UBL_8.txt"
-    elif b == 17:
-        fname = "UBL_17.txt"
-    else:
-        raise ValueError("interval does not support any of the precomputed UBL reps. May need to add")
-    with open(fname, 'rb') as f:
-        uc = pickle.load(f)
-
-    return Representation(initializeEncodings(uc, interval), "UBL")
+    return representationFromCodes(loadOrBuildEncoding("UBL", b), interval, "UBL")
 
 def generateNGG(interval, b = None):
     if b is None:
         b = numBitsToEncodeInterval(interval)
-    if b == 10:
-        fname = "NGG_10.txt"
-    elif b == 12:
-        fname = "NGG_12.txt"
-    elif b == 8:
-        fname = "NGG_8.txt"
-    elif b == 17:
-        fname = "NGG_17.txt"
-    else:
-        raise ValueError("interval does not support any of the precomputed NGG reps. May need to add")
-    with open(fname, 'rb') as f:
-        gc = pickle.load(f)
-
-    return Representation(initializeEncodings(gc, interval), "NGG")
+    return representationFromCodes(loadOrBuildEncoding("NGG", b), interval, "NGG")
 
 
 def generateModifiedBinaryRepresentation(interval):
     b = numBitsToEncodeInterval(interval)
-    bc = []
-    for i in range(0,2**b):
-        binstr = bin(i)[2:]
-        bc.append(('0'*(b-len(binstr))+binstr))
+    bc = binaryCodes(b)
     s1 = random.randrange(0,len(bc) - 1)
     s2 = random.randrange(0,len(bc)-1)
     bc[s1],bc[s2] = bc[s2], bc[s1]
-    binRep = initializeEncodings(bc, interval)
-    return Representation(binRep, "binary")
+    return representationFromCodes(bc, interval, "binary")
 
 def generateRandomRepresentation(interval, name = 'r'):
     """
     returns a random mapping between bitstrings to numbers in the interval
     """
     b = numBitsToEncodeInterval(interval)
-    c = list(GrayCode(b).generate_gray())
+    c = list(range(2**b))
     random.shuffle(c)
-    randRep = initializeEncodings(c, interval)
-    return Representation(randRep, name)
+    return representationFromCodes(numpy.array(c, dtype = numpy.int64), interval, name)
 
 
 def generateWorstRepresentation(nbits, name = 'w'):
@@ -212,41 +364,38 @@ def generateWorstRepresentation(nbits, name = 'w'):
     returns an encoding on nbits that has the worst locality using Harpers algorithm.
     """
     b = nbits
-    c = list(GrayCode(b).generate_gray())
-    rep = {}
-    startstr = random.choice(c)
-    parity = startstr.count("1") % 2
-    rep[startstr] = 0
+    c = list(range(2**b))
+    start = random.choice(c)
+    parity = bin(start).count("1") % 2
 
-    sameParity = list(filter(lambda x: x.count("1")%2 == parity, c))
-    sameParity.remove(startstr)
+    sameParity = [x for x in c if bin(x).count("1") % 2 == parity and x != start]
     random.shuffle(sameParity)
 
-    oppParity = list(filter(lambda x: x.count("1")%2 != parity, c))
+    oppParity = [x for x in c if bin(x).count("1") % 2 != parity]
     random.shuffle(oppParity)
 
     assert(len(sameParity) + 1 + len(oppParity) == len(c))
 
-    for i in range(len(sameParity)):
-        rep[sameParity[i]] = i + 1
-
-    for i in range(len(oppParity)):
-        rep[oppParity[i]] = i + 2**(b-1)
+    # the start maps to 0, the rest of its parity class to 1, ..., and the other class to 2^(b-1), ...
+    codes = numpy.array([start] + sameParity + oppParity, dtype = numpy.int64)
+    return representationFromCodes(codes, (0, 2**b - 1, 1), name)
+    
 
-    rp = Representation(rep, name)
+def generateAllReps(numbits, reduce = False):
+    """
+    returns a list of all representations on numbits bits (one per symmetry class if reduce is True).
+    The list grows as (2^numbits)!, use iterAllReps to stream the representations instead
+    """
+    return list(iterAllReps(numbits, reduce))
 
-    return Representation(rep, name)
-    
 
-def generateAllReps(numbits):
+def iterAllReps(numbits, reduce = False, shard = 0, shards = 1):
     """
-    returns a list of all representations on numbits bits
+    yields all representations on numbits bits one at a time, backed by compact code word arrays
+    (see enumeration.enumerate_encodings for reduce and sharding)
     """
-    c = list(GrayCode(numbits).generate_gray())
-    reps = []
-    for perm in list(itertools.permutations(c)):
-        reps.append(Representation(initializeEncodings(perm, (0, (2**numbits)-1, 1)), 'name'))
-    return reps
+    for codes in enumeration.enumerate_encodings(numbits, reduce, shard, shards):
+        yield representationFromCodes(codes, (0, 2**numbits - 1, 1), 'name')
 
 
 
@@ -274,30 +423,20 @@ def allOptimaBitstring(perm, rep, key = max):
     Returns list of local optima -- induced optima (min or max) -- given a function perm and the bitstring representation (neighborhood = len of bitstring)
     perm is the function inducing optima in the bitstrings, as a list
     rep is a representation obj
+    The optima are listed in the order of the numbers they map to
     """
-
-    flip = lambda x: '1' if x == '0' else '0'
-
-    optima = 0
-    rmap = rep.get_rep()
-    optlist = []
-  
-    for b in list(rmap.keys()): 
-        # neighbors, including itself
-        neighbs = [b[:i] + flip(b[i]) + b[i+1:] for i in range(len(b))]
-        opts = [perm[rep.to_num(nb)] <= perm[rep.to_num(b)] for nb in neighbs]
-        if all(opts):
-            optlist.append(b)
-        
-    return optlist
+    b = rep.num_bits()
+    codes = rep.get_inverse_table()
+    return [format(c, '0' + str(b) + 'b') for c in codes[landscape.optima_mask(perm, rep, key)[codes]].tolist()]
 
 def countOptimaBitstring(perm, rep, key=max):
     """
     Counts the number of induced optima (min or max) given a function perm and the bitstring representation (neighborhood = len of bitstring)
-    perm is the function inducing optima in the bitstrings, as a list
+    perm is the function inducing optima in the bitstrings, as a list, or a matrix with one function per row (returns one count per row)
     rep is a representation obj
     """
-    return len(allOptimaBitstring(perm,rep,key))
+    counts = landscape.count_optima(perm, rep, key)
+    return counts.tolist() if numpy.ndim(counts) else int(counts)
 
 
 def optimaFitMetric(a, rep, key = max):
@@ -306,21 +445,18 @@ def optimaFitMetric(a, rep, key = max):
     a = a value
     rep = rep object
     """
-    perm =  [a - abs(x - a) for x in range(0,2**rep.num_bits())]
-    optlist = allOptimaBitstring(perm, rep, key)
-    globalopt = rep.to_bitstr(a)
-    optlist.remove(globalopt)
-    if optlist == []:
+    b = rep.num_bits()
+    perm = landscape.one_max_targets(b, [a])[0]
+    F = landscape.induced_fitness(perm, rep)
+    nbrs = landscape.neighbors(b)
+    optima = landscape.optima_mask(perm, rep, key)
+    globalopt = int(numpy.flatnonzero(landscape.value_index(rep) == a)[0])
+    optima[globalopt] = False
+    if not optima.any():
         return 0
-    s = 0
-    
-    for i in range(len(optlist)):
-        for neighb in rep.get_neighbors(optlist[i]):
-            s += abs(perm[rep.to_num(optlist[i])] - perm[rep.to_num(neighb)])
-
-    for neighb in rep.get_neighbors(globalopt):
-        s -= abs(a - perm[rep.to_num(neighb)])
-    return s/(len(optlist)*len(globalopt))
+    opt = numpy.flatnonzero(optima)
+    s = numpy.abs(F[opt, None] - F[nbrs[opt]]).sum() - numpy.abs(a - F[nbrs[globalopt]]).sum()
+    return float(s/(len(opt)*b))
 
 
 
@@ -330,18 +466,10 @@ def findOneMaxA(rep1, rep2, b):
     Finds all a values such that the induced number of maxima in rep1 is less than the 
     induced number of maxima in rep2
     """
-    avals = []
-    perms = [[(2**(b)-1) - abs(x - a) for x in range(2**b)] for a in range(2**b)]
-    a = 0
-    for perm in perms: 
-        b1 = countOptimaBitstring(perm, rep1, max)
-        b2 = countOptimaBitstring(perm, rep2, max)
-        print(b1, b2)
-        if b1 <= b2:
-            avals.append(a)
-        a += 1
-
-    return avals
+    assert rep1.num_bits() == b and rep2.num_bits() == b, "representations are not on b bits"
+    b1 = landscape.one_max_optima_counts(rep1)
+    b2 = landscape.one_max_optima_counts(rep2)
+    return numpy.flatnonzero(b1 <= b2).tolist()
 
 def eitanify(rep):
     """
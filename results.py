@@ -0,0 +1,100 @@
+"""
+Result sinks for the online (per fitness evaluation) and best solution (per generation) outputs of the GA.
+
+A sink is opened with the path of an output file without its extension, receives fitness values one
+at a time or in batches, and must be closed (or used in a with statement) so the last values are flushed.
+
+TextResultSink writes the original format, one str(float) line per value in a .txt file.
+BinaryResultSink buffers the values and appends them as raw little-endian float64 to a .f64 file,
+which avoids formatting every float. Use read_results to load either format.
+"""
+import os
+import numpy
+
+
+class TextResultSink:
+    """
+    writes one line per value to path + ".txt"
+    """
+    EXTENSION = ".txt"
+
+    def __init__(self, path):
+        self._f = open(path + self.EXTENSION, 'w')
+
+    def write(self, value):
+        self._f.write(str(value) + "\n")
+
+    def write_many(self, values):
+        self._f.writelines(str(value) + "\n" for value in values)
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BinaryResultSink:
+    """
+    appends values as float64 to path + ".f64". Values are kept in memory until buffer_size
+    of them have been written, then appended to the file in one call.
+    """
+    EXTENSION = ".f64"
+
+    def __init__(self, path, buffer_size = 8192):
+        self._f = open(path + self.EXTENSION, 'wb')
+        self._buffer = []
+        self._buffer_size = buffer_size
+
+    def write(self, value):
+        self._buffer.append(value)
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def write_many(self, values):
+        self._buffer.extend(values)
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            numpy.asarray(self._buffer, dtype='<f8').tofile(self._f)
+            self._buffer = []
+        self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_result_sinks(file, sink = TextResultSink, directory = "caruana_data"):
+    """
+    returns the (online, best solution) sinks of the GA run named file, e.g. caruana_data/file.txt
+    and caruana_data/filebest_sol.txt for the text sink
+    """
+    path = os.path.join(directory, file)
+    return sink(path), sink(path + "best_sol")
+
+
+def read_results(fname):
+    """
+    returns the values in a result file written by any sink as a numpy float64 array
+    """
+    if fname.endswith(BinaryResultSink.EXTENSION):
+        return numpy.fromfile(fname, dtype='<f8')
+    with open(fname, 'r') as f:
+        return numpy.array([float(line.rstrip()) for line in f])
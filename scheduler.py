@@ -0,0 +1,72 @@
+"""
+Chunked job scheduler for GA sweeps.
+
+Instead of submitting every job to the pool up front, run_jobs keeps a bounded number of jobs in
+flight, hands out results as soon as they complete (not in submission order), and fails fast
+when a job raises. sweep_pool creates a pathos pool and always shuts it down cleanly.
+"""
+import contextlib
+import multiprocessing as mp
+
+
+class JobFailed(Exception):
+    """
+    raised by run_jobs when a job raises. task is the argument tuple of the failed job
+    """
+    def __init__(self, task, error):
+        Exception.__init__(self, "job " + repr(task) + " failed: " + repr(error))
+        self.task = task
+        self.error = error
+
+
+def run_jobs(pool, func, tasks, max_in_flight, poll = 0.05):
+    """
+    Submits func(*task) to pool for every task in the iterable tasks, with at most max_in_flight jobs
+    outstanding at a time. Yields (task, result) pairs in completion order. Raises JobFailed on the
+    first job that raises.
+    """
+    tasks = iter(tasks)
+    in_flight = []
+    exhausted = False
+    while in_flight or not exhausted:
+        while not exhausted and len(in_flight) < max_in_flight:
+            task = next(tasks, None)
+            if task is None:
+                exhausted = True
+            else:
+                in_flight.append((task, pool.apipe(func, *task)))
+        if not in_flight:
+            break
+
+        done = [job for job in in_flight if job[1].ready()]
+        if not done:
+            in_flight[0][1].wait(poll)
+            continue
+        for job in done:
+            in_flight.remove(job)
+            task, result = job
+            try:
+                value = result.get()
+            except Exception as e:
+                raise JobFailed(task, e) from e
+            yield task, value
+
+
+@contextlib.contextmanager
+def sweep_pool(nodes = None, **kwds):
+    """
+    context manager for a pathos ProcessingPool with nodes workers (all cores if None). The pool is
+    closed and joined on normal exit, and terminated if the sweep fails.
+    """
+    from pathos.multiprocessing import ProcessingPool as Pool
+    pool = Pool(nodes or mp.cpu_count(), **kwds)
+    try:
+        yield pool
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+        pool.join()
+    finally:
+        pool.clear()
@@ -0,0 +1,82 @@
+"""
+Deterministic seeding for reproducible (parallel) GA runs.
+
+Every (function, encoding, trial) of a sweep gets its own independent random stream, derived
+from one master seed with numpy's SeedSequence. The stream of a trial does not depend on which
+worker runs it or on which other trials it is batched with, so any trial can be reproduced from
+the master seed alone.
+
+All random draws of the GA (initialization, selection, crossover, mutation and the noise of f4)
+go through a numpy Generator passed as rng. TrialStreams bundles the streams of several trials so
+GA_SEARCH_BATCH can keep drawing for all of them at once.
+"""
+import zlib
+import numpy
+
+
+def get_rng(rng = None):
+    """
+    returns rng, or a new Generator seeded from OS entropy if rng is None
+    """
+    if rng is None:
+        return numpy.random.default_rng()
+    return rng
+
+
+def trial_seed_sequence(master_seed, function, encoding, trial):
+    """
+    returns the SeedSequence of one trial: the child of master_seed with spawn key (function, encoding, trial).
+    function and trial are integers, encoding a name such as "BRG"
+    """
+    return numpy.random.SeedSequence(master_seed, spawn_key = (function, zlib.crc32(encoding.encode()), trial))
+
+
+def trial_rng(master_seed, function, encoding, trial):
+    """
+    returns the Generator of one trial
+    """
+    return numpy.random.default_rng(trial_seed_sequence(master_seed, function, encoding, trial))
+
+
+def trial_streams(master_seed, function, encoding, first_trial, trials):
+    """
+    returns the TrialStreams of trials first_trial, ..., first_trial + trials - 1
+    """
+    return TrialStreams([trial_rng(master_seed, function, encoding, first_trial + t) for t in range(trials)])
+
+
+class TrialStreams:
+    """
+    A stack of per-trial Generators that draws like a single Generator. The first axis of every requested
+    size must be a multiple of the number of trials: trial t draws its equal share of that axis from its own
+    stream, so the numbers a trial gets are the same as if it had been run on its own.
+    """
+    def __init__(self, rngs):
+        self._rngs = list(rngs)
+
+    def __len__(self):
+        return len(self._rngs)
+
+    def __iter__(self):
+        return iter(self._rngs)
+
+    def _stack(self, draw, size):
+        size = (size,) if numpy.isscalar(size) else tuple(size)
+        assert size[0] % len(self._rngs) == 0, "first axis is not split evenly over the trials"
+        share = (size[0]//len(self._rngs),) + size[1:]
+        return numpy.concatenate([draw(rng, share) for rng in self._rngs])
+
+    def random(self, size):
+        return self._stack(lambda rng, s: rng.random(s), size)
+
+    def uniform(self, low, high, size):
+        return self._stack(lambda rng, s: rng.uniform(low, high, s), size)
+
+    def integers(self, low, high, size):
+        return self._stack(lambda rng, s: rng.integers(low, high, s), size)
+
+    def normal(self, loc, scale, size):
+        return self._stack(lambda rng, s: rng.normal(loc, scale, s), size)
+
+    def choice(self, a, size):
+        return self._stack(lambda rng, s: rng.choice(a, s), size)
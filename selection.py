@@ -0,0 +1,96 @@
+"""
+Selection strategies for the GA that draw a whole mating pool in one vectorized call.
+
+The sampling structure for a generation is built once from the fitness values of the
+population and can then be drawn from any number of times.
+
+Every strategy has the signature strategy(fitness, f_prime, key, n, rng) and returns a numpy array
+of n row indices into the numpy array fitness, where f_prime is the scaling window value and key is
+min or max. Strategies with parameters (e.g. the tournament size) are configured with functools.partial.
+"""
+import numpy
+from seeding import get_rng
+
+
+class WheelSampler:
+    """
+    Roulette wheel over a population. Built once per generation from the performance values
+    (see chromosome.Chromosome.performance_value) of every individual; each draw is a binary
+    search in the cumulative sum of the weights. If the total weight is zero, draws are uniform.
+
+    weights -- sequence of non-negative performance values, one per individual
+    """
+    def __init__(self, weights):
+        self._cum = numpy.cumsum(numpy.asarray(weights, dtype=float))
+        self._n = len(self._cum)
+        self._total = self._cum[-1]
+
+    def draw(self, n, rng = None):
+        """
+        returns a numpy array of n individual indices drawn with replacement
+        """
+        rng = get_rng(rng)
+        if self._total == 0:
+            return rng.integers(0, self._n, n)
+        picks = numpy.searchsorted(self._cum, rng.uniform(0, self._total, n), side = 'right')
+        return numpy.minimum(picks, self._n - 1)
+
+
+def performance_values(fitness, f_prime, key):
+    """
+    u(x) for every individual. f_prime is determined by the scaling window.
+    """
+    if key == min:
+        return f_prime - fitness
+    else:
+        return fitness - f_prime
+
+
+def wheel_selection(fitness, f_prime, key, n, rng = None):
+    """
+    Selects n individuals according to a fitness proportion distribution and returns their row indices.
+    Falls back to uniform selection if the total performance value is zero.
+    fitness -- numpy array of fitness values of the population
+    key -- min if minimizing fitness and max if maximizing fitness
+    """
+    return WheelSampler(performance_values(fitness, f_prime, key)).draw(n, rng)
+
+
+def stochastic_universal_sampling(fitness, f_prime, key, n, rng = None):
+    """
+    Baker's stochastic universal sampling: the same expected number of copies as wheel_selection, but the n picks
+    are evenly spaced pointers on the wheel with one random offset, so the spread around the expectation is minimal.
+    The picks are returned in random order, so that consecutive parents are not neighbors on the wheel.
+    """
+    rng = get_rng(rng)
+    cum = numpy.cumsum(performance_values(fitness, f_prime, key))
+    if cum[-1] == 0:
+        return rng.integers(0, len(fitness), n)
+    pointers = (rng.uniform(0, 1) + numpy.arange(n))*(cum[-1]/n)
+    picks = numpy.minimum(numpy.searchsorted(cum, pointers, side = 'right'), len(fitness) - 1)
+    return rng.permutation(picks)
+
+
+def tournament_selection(fitness, f_prime, key, n, rng = None, k = 2):
+    """
+    k-tournament selection: each of the n picks is the fittest of k individuals drawn uniformly (with replacement,
+    so all tournaments are drawn as one (n, k) array). f_prime is not used
+    """
+    rng = get_rng(rng)
+    contestants = rng.integers(0, len(fitness), (n, k))
+    best = numpy.argmin if key == min else numpy.argmax
+    return contestants[numpy.arange(n), best(fitness[contestants], axis = 1)]
+
+
+def rank_selection(fitness, f_prime, key, n, rng = None, pressure = 1.5):
+    """
+    linear ranking selection: individuals are drawn with a probability that depends only on their rank, from
+    (2 - pressure)/popsize for the worst to pressure/popsize for the best (1 <= pressure <= 2). f_prime is not used
+    """
+    assert 1 <= pressure and pressure <= 2, "invalid selection pressure"
+    size = len(fitness)
+    order = numpy.argsort(-fitness if key == min else fitness, kind = 'stable')   # worst first
+    rank = numpy.empty(size)
+    rank[order] = numpy.arange(size)
+    weights = (2 - pressure) + 2*(pressure - 1)*rank/max(size - 1, 1)
+    return WheelSampler(weights).draw(n, rng)
@@ -0,0 +1,94 @@
+"""
+Consolidated storage for all trials of one (function, encoding) pair of a sweep.
+
+Instead of two text files per trial, a SweepStore keeps three memory-mapped .npy arrays:
+
+    name.online.npy    -- (trials, evals) float64, the fitness of every evaluation of every trial
+    name.best_sol.npy  -- (trials, gens) float64, the best fitness of every generation of every trial
+    name.done.npy      -- (trials,) bool, which trials have been written
+
+Trials are numbered from 1 like the trial files written by main.py. Different processes may write
+different trials of the same store at the same time.
+"""
+import math
+import os
+import numpy
+from numpy.lib.format import open_memmap
+from results import read_results
+
+
+def run_shape(popsize, eval_limit = 5000):
+    """
+    returns (evals, gens), the number of online and best solution values a GA run with the given
+    population size writes before reaching eval_limit fitness evaluations
+    """
+    per_gen = 2*(popsize//2)
+    return eval_limit, 1 + math.ceil((eval_limit - popsize)/per_gen)
+
+
+class SweepStore:
+    """
+    path -- path of the store without extension, e.g. caruana_data/f1_BRG
+    trials, evals, gens -- shape of a new store. If trials is None, the existing store at path is opened
+    """
+    def __init__(self, path, trials = None, evals = None, gens = None):
+        self._path = path
+        if trials is None:
+            self._online = open_memmap(path + ".online.npy", mode = 'r+')
+            self._best_sol = open_memmap(path + ".best_sol.npy", mode = 'r+')
+            self._done = open_memmap(path + ".done.npy", mode = 'r+')
+        else:
+            self._online = open_memmap(path + ".online.npy", mode = 'w+', dtype = '<f8', shape = (trials, evals))
+            self._best_sol = open_memmap(path + ".best_sol.npy", mode = 'w+', dtype = '<f8', shape = (trials, gens))
+            self._done = open_memmap(path + ".done.npy", mode = 'w+', dtype = bool, shape = (trials,))
+            self._online[:] = numpy.nan
+            self._best_sol[:] = numpy.nan
+            self.flush()
+
+    def num_trials(self):
+        return len(self._done)
+
+    def write_trials(self, first_trial, online, best_sol):
+        """
+        stores the outputs of consecutive trials first_trial, first_trial + 1, ...
+        online -- (n, evals) array of online values, best_sol -- (n, gens) array of best solution values
+        """
+        rows = slice(first_trial - 1, first_trial - 1 + len(online))
+        self._online[rows] = online
+        self._best_sol[rows] = best_sol
+        self.flush()
+        self._done[rows] = True
+        self._done.flush()
+
+    def completed(self):
+        """
+        returns the numbers of the trials that have been written
+        """
+        return numpy.flatnonzero(self._done) + 1
+
+    def iter_chunks(self, which = "online", chunk = 256):
+        """
+        yields the rows of the completed trials in chunks of at most chunk trials, reading the
+        store front to back. which is "online" or "best_sol"
+        """
+        data = self._online if which == "online" else self._best_sol
+        for start in range(0, self.num_trials(), chunk):
+            done = self._done[start:start + chunk]
+            if done.any():
+                yield numpy.asarray(data[start:start + chunk][done])
+
+    def flush(self):
+        self._online.flush()
+        self._best_sol.flush()
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(path + ".done.npy")
+
+
+def import_trial_files(store, fnames_online, fnames_best_sol, first_trial = 1):
+    """
+    copies per-trial result files (any format read by results.read_results) into store, one trial per pair of files
+    """
+    for t, (fname1, fname2) in enumerate(zip(fnames_online, fnames_best_sol)):
+        store.write_trials(first_trial + t, read_results(fname1)[None], read_results(fname2)[None])
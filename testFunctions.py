@@ -6,7 +6,8 @@ A Test function interface
 
 """
 import math
-import random
+import numpy
+from seeding import get_rng
 
 class TestFn:
     """
@@ -15,23 +16,111 @@ class TestFn:
     name -- a string description of the function (e.g. "Parabola with noise")
     formula -- a real valued function that is scalar valued in its output and vector valued in its input   
     dim -- dimension of the input space R^dim
+    batch_formula -- optional numpy version of formula that maps a (n, dim) matrix of input vectors to the n function values
+    deterministic -- False if evaluating the same vector twice can give different values (e.g. functions with noise).
+                     Fitness values of such functions are never cached
+    noise -- optional additive noise, a function noise(rng, size) that draws size samples from the numpy Generator rng
+             (a single sample if size is None). A function with noise is never deterministic
+    term -- declares the function separable: term(i, x) is the contribution of coordinate i with value x, and formula(X)
+            is the sum of term(i, X[i]) over all coordinates. The GA then only recomputes the terms of changed genes
+    batch_term -- optional numpy version of term that maps arrays of coordinates i and values x to the array of terms
     """
-    def __init__(self, name, formula, dimension):
+    def __init__(self, name, formula, dimension, batch_formula=None, deterministic=True, noise=None, term=None, batch_term=None):
         self._name = name
         self._f = formula 
         self._n = dimension
+        self._batch_f = batch_formula
+        self._deterministic = deterministic and noise is None
+        self._noise = noise
+        self._term = term
+        self._batch_term = batch_term
 
-    def eval(self, vector):
+    def eval(self, vector, rng=None):
         """
         evaluates the function with a given real valued vector. The vector can be a tuple or a list
+        rng -- numpy Generator for the noise of the function, if any (see seeding.py)
+        """
+        if self._noise is None:
+            return self.eval_formula(vector)
+        return self.eval_formula(vector) + float(self._noise(get_rng(rng), None))
+
+    def eval_formula(self, vector):
+        """
+        evaluates the function without its noise. Evaluators (see fitness.py) run this in parallel and add the noise
+        afterwards with sample_noise, so the noise still comes from the caller's random stream
         """
         if len(vector) != self._n:
             raise ValueError("Input dimensions don't match")
         return self._f(vector)
 
+    def sample_noise(self, rng=None, size=None):
+        """
+        draws size samples of the additive noise of the function (a single sample if size is None), or zeros if the
+        function has no noise
+        """
+        if self._noise is None:
+            return 0.0 if size is None else numpy.zeros(size)
+        return self._noise(get_rng(rng), size)
+
+    def eval_batch(self, matrix, rng=None):
+        """
+        evaluates the function on every row of a (n, dim) matrix of real valued vectors and returns a numpy array
+        of the n function values. Falls back to calling eval on each row if there is no batch formula.
+        Noise is drawn once per row.
+        """
+        matrix = numpy.asarray(matrix, dtype=float)
+        if matrix.ndim != 2 or matrix.shape[1] != self._n:
+            raise ValueError("Input dimensions don't match")
+        if self._batch_f is None:
+            values = numpy.array([self._f(vec) for vec in matrix.tolist()], dtype=float)
+        else:
+            values = self._batch_f(matrix)
+        if self._noise is None:
+            return values
+        return values + self._noise(get_rng(rng), len(matrix))
+
+    def is_separable(self):
+        return self._term is not None
+
+    def eval_term(self, i, x):
+        """
+        the term of coordinate i with value x of a separable function
+        """
+        return self._term(i, x)
+
+    def eval_terms_batch(self, I, X):
+        """
+        returns a numpy array with the term of every pair of coordinate I[k] and value X[k] of a separable function
+        """
+        if self._batch_term is None:
+            return numpy.array([self._term(i, x) for i, x in zip(numpy.ravel(I).tolist(), numpy.ravel(X).tolist())],
+                               dtype=float).reshape(numpy.shape(X))
+        return self._batch_term(I, X)
+
+    def from_terms(self, terms, rng=None):
+        """
+        the function value of a separable function from the terms of all coordinates, with freshly drawn noise if the
+        function has noise. Gives the same value as eval for the same vector
+        """
+        if self._noise is None:
+            return sum(terms)
+        return sum(terms) + float(self._noise(get_rng(rng), None))
+
+    def from_terms_batch(self, terms, rng=None):
+        """
+        the function values of a (n, dim) array of terms, one row per input vector, with noise drawn once per row
+        """
+        values = numpy.sum(terms, axis=1)
+        if self._noise is None:
+            return values
+        return values + self._noise(get_rng(rng), len(values))
+
     def get_input_dimension(self):
         return self._n
 
+    def is_deterministic(self):
+        return self._deterministic
+
     def __str__(self):
         return self._name
 
@@ -42,19 +131,26 @@ class TestFn:
 
 
 # Rosenbrock's saddle function in 2 dimensions
-f2 = TestFn("Rosenbrock's Saddle", lambda X: ((1-X[0])**2)+100*((X[0]**2)-X[1])**2, dimension=2)
+f2 = TestFn("Rosenbrock's Saddle", lambda X: ((1-X[0])**2)+100*((X[0]**2)-X[1])**2, dimension=2,
+            batch_formula=lambda X: ((1-X[:,0])**2)+100*((X[:,0]**2)-X[:,1])**2)
 
 # Beale's function in 2 dimensions
-BEALEf = TestFn("Beale function", lambda X: ((1.5-X[0]+X[0]*X[1])**2) + ((2.25-X[0]+X[0]*X[1]**2)**2) + ((2.625-X[0]+X[0]*X[1]**3)**2), dimension=2)
+BEALEf = TestFn("Beale function", lambda X: ((1.5-X[0]+X[0]*X[1])**2) + ((2.25-X[0]+X[0]*X[1]**2)**2) + ((2.625-X[0]+X[0]*X[1]**3)**2), dimension=2,
+                batch_formula=lambda X: ((1.5-X[:,0]+X[:,0]*X[:,1])**2) + ((2.25-X[:,0]+X[:,0]*X[:,1]**2)**2) + ((2.625-X[:,0]+X[:,0]*X[:,1]**3)**2))
 
 # Parabola in 3 dimensions
-f1 = TestFn("Parabola", lambda X: sum([x_i**2 for x_i in X]), dimension=3)
+f1 = TestFn("Parabola", lambda X: sum([x_i**2 for x_i in X]), dimension=3,
+            batch_formula=lambda X: numpy.sum(X**2, axis=1), term=lambda i, x: x**2, batch_term=lambda i, x: x**2)
 
 # Step function in 5 dimensions
-f3 = TestFn("Step function", lambda X: sum([math.floor(X[i]) for i in range(len(X))]), dimension=5)
+f3 = TestFn("Step function", lambda X: sum([math.floor(X[i]) for i in range(len(X))]), dimension=5,
+            batch_formula=lambda X: numpy.sum(numpy.floor(X), axis=1), term=lambda i, x: math.floor(x),
+            batch_term=lambda i, x: numpy.floor(x))
 
-# Quartic with noise in 30 dimensions
-f4 = TestFn("Quartic with noise", lambda X: sum([i*(X[i]**4) for i in range(len(X))]) + random.gauss(mu=0,sigma=1), dimension=30)
+# Quartic with noise in 30 dimensions. The noise is Gaussian with mean 0 and standard deviation 1.
+f4 = TestFn("Quartic with noise", lambda X: sum([i*(X[i]**4) for i in range(len(X))]), dimension=30,
+            batch_formula=lambda X: numpy.sum(numpy.arange(X.shape[1])*X**4, axis=1), noise=lambda rng, size: rng.normal(0, 1, size),
+            term=lambda i, x: i*(x**4), batch_term=lambda i, x: i*(x**4))
 
 # Shekel's foxholes in 2 dimension
 def shekel(X):
@@ -63,8 +159,16 @@ def shekel(X):
     A = [A_1, A_2]
     return 1/((1/500) + sum([1/(j+sum([(X[i]-A[i][j-1])**6 for i in range(0,len(X))])) for j in range(1,26)]))
 
-f5 = TestFn("Shekel's Foxholes", shekel, dimension=2)
+SHEKEL_A = numpy.array([[-32, -16, 0, 16, 32]*5, numpy.repeat([-32, -16, 0, 16, 32], 5)])
+
+def shekel_batch(X):
+    # (n, 2, 1) - (2, 25) broadcasts to the distance of every row to every foxhole
+    holes = numpy.sum((X[:, :, None] - SHEKEL_A)**6, axis=1)
+    return 1/((1/500) + numpy.sum(1/(numpy.arange(1, 26) + holes), axis=1))
+
+f5 = TestFn("Shekel's Foxholes", shekel, dimension=2, batch_formula=shekel_batch)
 
 # Easom function in 2 dimensions
 
-EASOM = TestFn("Easom function", lambda X: -math.cos(X[0])*math.cos(X[1])*math.exp(-1*(X[0]-math.pi)**2 - (X[1]-math.pi)**2), dimension=2)
\ No newline at end of file
+EASOM = TestFn("Easom function", lambda X: -math.cos(X[0])*math.cos(X[1])*math.exp(-1*(X[0]-math.pi)**2 - (X[1]-math.pi)**2), dimension=2,
+               batch_formula=lambda X: -numpy.cos(X[:,0])*numpy.cos(X[:,1])*numpy.exp(-1*(X[:,0]-numpy.pi)**2 - (X[:,1]-numpy.pi)**2))